@@ -1,22 +1,219 @@
 import torch
-from transformers import CLIPProcessor, CLIPModel
+import torch.nn.functional as F
+from torch.utils.data import Dataset, DataLoader
+from torchvision.transforms import v2, InterpolationMode
+from transformers import CLIPTokenizer, CLIPModel
 from PIL import Image
 import numpy as np
 import cv2
+import contextlib
 import logging
+import multiprocessing
+import os
+import functools
+
+from heuristic_kernels import lap_var_and_std
 
 logger = logging.getLogger(__name__)
 
+# Normalization constants from the original CLIP preprocessing
+CLIP_MEAN = [0.48145466, 0.4578275, 0.40821073]
+CLIP_STD = [0.26862954, 0.26130258, 0.27577711]
+
+# Decode workers start from a clean process: forking would copy the pipeline's running
+# threads (gateway, log listener, executors) and any locks they hold
+WORKER_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# Compiled CLIP batches are padded to these sizes so captured graphs get reused
+BATCH_BUCKETS = (1, 8, 32)
+
+# Try to import ONNX Runtime for the exported vision tower
+try:
+    import onnxruntime as ort
+    ORT_AVAILABLE = True
+except ImportError:
+    ORT_AVAILABLE = False
+
+# Try to load libjpeg-turbo for faster JPEG decode
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _turbojpeg = TurboJPEG()
+except Exception:
+    _turbojpeg = None
+
+
+def decode_image(image_path, min_side=224):
+    """
+    Decode an image, reduced if it is much larger than needed
+    
+    Large images are decoded at 1/2, 1/4 or 1/8 scale (libjpeg DCT scaling)
+    as long as the result still covers the CLIP input.
+    min_side=None always decodes at full scale: the heuristics' thresholds assume
+    native-resolution pixels, so heuristic_pixels re-decodes reduced images.
+    
+    Returns:
+        tuple: (BGR uint8 array, full width, full height, scale factor used),
+        or None if unreadable
+    """
+    try:
+        with Image.open(image_path) as header:
+            width, height = header.size
+            is_jpeg = header.format == "JPEG"
+    except OSError:
+        return None
+    
+    factor = 1
+    for f in (8, 4, 2) if min_side is not None else ():
+        if min(width, height) // f >= min_side:
+            factor = f
+            break
+    
+    img = None
+    if is_jpeg and _turbojpeg is not None:
+        try:
+            with open(image_path, 'rb') as f:
+                img = _turbojpeg.decode(f.read(), pixel_format=TJPF_BGR, scaling_factor=(1, factor))
+        except Exception:
+            img = None
+    
+    if img is None:
+        flag = {
+            8: cv2.IMREAD_REDUCED_COLOR_8,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+        }.get(factor, cv2.IMREAD_COLOR)
+        img = cv2.imread(image_path, flag)
+    
+    if img is None:
+        # Formats OpenCV can't read (e.g. GIF); always full scale
+        try:
+            with Image.open(image_path) as image:
+                img = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+            factor = 1
+        except Exception:
+            return None
+    
+    return img, width, height, factor
+
+
+def heuristic_pixels(image_path, img, factor):
+    """Full-scale pixels for the heuristics: img itself unless it was DCT-reduced"""
+    if factor == 1:
+        return img
+    
+    decoded = decode_image(image_path, min_side=None)
+    if decoded is None:
+        raise ValueError("unreadable at full scale")
+    return decoded[0]
+
+
+def heuristic_score(image_path, img, width, height, factor=1):
+    """Heuristic quality from resolution, aspect ratio, sharpness and color"""
+    try:
+        return _heuristic_score(heuristic_pixels(image_path, img, factor), width, height)
+    except Exception as e:
+        logger.error(f"Heuristic error: {e}")
+        return 0.5
+
+
+def _heuristic_score(img, width, height):
+    """heuristic_score without the error handling (raises on bad input); img must be full scale"""
+    score = 0.5
+    
+    # Resolution
+    pixels = height * width
+    
+    if pixels >= 1920 * 1080:
+        score += 0.15
+    elif pixels >= 1280 * 720:
+        score += 0.10
+    elif pixels < 400 * 400:
+        score -= 0.20
+    
+    # Aspect ratio
+    aspect = width / height
+    if 0.8 <= aspect <= 1.5:
+        score += 0.05
+    elif aspect < 0.5 or aspect > 3.0:
+        score -= 0.10
+    
+    # Stats on native-resolution pixels: any downscale (resize or DCT-reduced decode)
+    # inflates Laplacian variance, and the thresholds below were tuned at full scale.
+    # Sharpness (Laplacian variance) and color diversity in one pass
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    laplacian_var, color_std = lap_var_and_std(gray, img)
+    
+    if laplacian_var > 500:
+        score += 0.10
+    elif laplacian_var < 100:
+        score -= 0.15
+    
+    if color_std > 50:
+        score += 0.05
+    elif color_std < 20:
+        score -= 0.10
+    
+    return min(max(score, 0.0), 1.0)
+
+
+def to_pixel_tensor(img):
+    """BGR uint8 array -> RGB uint8 [3, H, W] tensor"""
+    rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return torch.from_numpy(rgb).permute(2, 0, 1)
+
+
+class MemeImageDataset(Dataset):
+    """Decodes memes once, yielding CLIP pixels and heuristic scores"""
+    
+    def __init__(self, image_paths, transform):
+        self.image_paths = image_paths
+        self.transform = transform
+        self.image_size = transform.transforms[-1].size
+    
+    def __len__(self):
+        return len(self.image_paths)
+    
+    def __getitem__(self, index):
+        """
+        Returns (uint8 pixels, heuristic score, index, loaded ok, error message or "")
+        
+        Runs in DataLoader worker processes, whose logging isn't wired to the
+        parent's handlers, so errors travel back with the sample and the parent
+        logs them.
+        """
+        path = self.image_paths[index]
+        try:
+            decoded = decode_image(path, min(self.image_size))
+            if decoded is None:
+                raise ValueError("unreadable image")
+            
+            img, width, height, factor = decoded
+            pixels = self.transform(to_pixel_tensor(img))
+        except Exception as e:
+            return torch.zeros((3, *self.image_size), dtype=torch.uint8), 0.0, index, False, str(e)
+        
+        try:
+            heuristic = _heuristic_score(heuristic_pixels(path, img, factor), width, height)
+        except Exception as e:
+            return pixels, 0.5, index, True, f"heuristic error: {e}"
+        
+        return pixels, heuristic, index, True, ""
+
 
 class MemeSelector:
     """AI-powered meme quality scorer using CLIP from Hugging Face transformers"""
     
-    def __init__(self, model_name="openai/clip-vit-base-patch32"):
+    def __init__(self, model_name="openai/clip-vit-base-patch32", onnx_path="clip_vit.onnx",
+                 precision="auto"):
         """
         Initialize CLIP model using transformers library
         
         Args:
             model_name: CLIP model to use (compatible with modern PyTorch)
+            onnx_path: Vision tower exported by export_clip_onnx.py, used when present
+            precision: "auto" (FP16 on GPU, FP32 on CPU), "fp32", "fp16" or "int8"
         """
         logger.info("Loading CLIP model...")
         
@@ -24,8 +221,17 @@ class MemeSelector:
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
             
             # Load CLIP using transformers (no dependency conflicts!)
-            self.model = CLIPModel.from_pretrained(model_name).to(self.device)
-            self.processor = CLIPProcessor.from_pretrained(model_name)
+            self.model = self._load_model(model_name, precision)
+            self._vision_forward, self._compiled = self._build_vision_forward(precision)
+            self.tokenizer = CLIPTokenizer.from_pretrained(model_name)
+            
+            # Resize/crop stays uint8 on CPU; scaling and normalization run on the model device
+            image_size = self.model.config.vision_config.image_size
+            self.image_size = (image_size, image_size)
+            self.resize_crop = v2.Compose([
+                v2.Resize(image_size, interpolation=InterpolationMode.BICUBIC, antialias=True),
+                v2.CenterCrop(image_size),
+            ])
             
             # Quality prompts
             self.quality_texts = [
@@ -42,12 +248,109 @@ class MemeSelector:
                 "boring text-heavy content"
             ]
             
+            # Prompts are fixed, so encode them once instead of per image
+            with torch.inference_mode():
+                text_inputs = self.tokenizer(
+                    self.quality_texts + self.low_quality_texts,
+                    return_tensors="pt",
+                    padding=True
+                ).to(self.device)
+                text_embeds = self.model.get_text_features(**text_inputs)
+                self.text_embeds = F.normalize(text_embeds, dim=-1)
+                self.logit_scale = self.model.logit_scale.exp().detach()
+            
+            self.onnx_session = self._load_onnx_session(onnx_path)
+            
             logger.info(f"✅ CLIP model loaded on {self.device}")
             
         except Exception as e:
             logger.error(f"Failed to load CLIP: {e}")
             raise
     
+    def _load_model(self, model_name, precision):
+        """Load CLIP weights at the requested precision, setting self.dtype"""
+        # Half precision on GPU halves weight bandwidth and uses tensor cores
+        if precision == "fp32" or self.device == "cpu":
+            self.dtype = torch.float32
+        else:
+            self.dtype = torch.float16
+        
+        if precision == "int8" and self.device == "cuda":
+            from transformers import BitsAndBytesConfig
+            
+            model = CLIPModel.from_pretrained(
+                model_name,
+                quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+                torch_dtype=self.dtype,
+                low_cpu_mem_usage=True,
+                attn_implementation="sdpa",
+                device_map="auto"
+            )
+            return model.eval()
+        
+        # Load straight into the target dtype, skipping random init of the weights
+        # SDPA maps attention onto the fused (flash / memory-efficient) kernel
+        model = CLIPModel.from_pretrained(
+            model_name,
+            torch_dtype=self.dtype,
+            low_cpu_mem_usage=True,
+            attn_implementation="sdpa"
+        ).to(self.device).eval()
+        logger.info(f"CLIP attention: {model.config._attn_implementation}")
+        
+        if precision == "int8":
+            # CPU: int8 Linear weights quarter the bandwidth of the memory-bound forward
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        
+        return model
+    
+    def _eager_vision_forward(self, pixel_values):
+        return self.model.get_image_features(pixel_values=pixel_values)
+    
+    def _build_vision_forward(self, precision):
+        """Compile the image tower on CUDA (Inductor fusion + CUDA graphs)"""
+        if self.device != "cuda" or precision == "int8" or not hasattr(torch, "compile"):
+            return self._eager_vision_forward, False
+        
+        compiled = torch.compile(
+            self._eager_vision_forward,
+            mode="reduce-overhead",
+            fullgraph=True,
+            dynamic=False
+        )
+        return compiled, True
+    
+    def _load_onnx_session(self, onnx_path):
+        """Load the exported vision tower into ONNX Runtime if available"""
+        if not ORT_AVAILABLE or not onnx_path or not os.path.exists(onnx_path):
+            return None
+        
+        try:
+            preferred = [
+                ("TensorrtExecutionProvider", {"trt_fp16_enable": True}),
+                "CUDAExecutionProvider",
+                "CPUExecutionProvider",
+            ]
+            available = ort.get_available_providers()
+            providers = [
+                p for p in preferred
+                if (p[0] if isinstance(p, tuple) else p) in available
+            ]
+            
+            session = ort.InferenceSession(onnx_path, providers=providers)
+            
+            self.text_embeds_np = self.text_embeds.float().cpu().numpy()
+            self.logit_scale_np = float(self.logit_scale)
+            
+            logger.info(f"✅ ONNX vision tower loaded ({session.get_providers()[0]})")
+            return session
+            
+        except Exception as e:
+            logger.warning(f"ONNX Runtime unavailable, using PyTorch: {e}")
+            return None
+    
     def score_meme(self, image_path):
         """
         Score meme quality (0.0 - 1.0)
@@ -59,106 +362,169 @@ class MemeSelector:
                   Viral: 0.80 - 0.95
         """
         try:
-            # Load image
-            image = Image.open(image_path).convert("RGB")
+            # Decode once; both scorers share the pixels unless CLIP's were reduced
+            decoded = decode_image(image_path, min(self.image_size))
+            if decoded is None:
+                raise ValueError("unreadable image")
+            
+            img, width, height, factor = decoded
             
             # CLIP semantic score
-            clip_score = self._get_clip_score(image)
+            pixel_values = self.resize_crop(to_pixel_tensor(img)).unsqueeze(0)
+            clip_score = self._get_pixel_scores(pixel_values)[0]
             
             # Heuristic scores
-            heuristic_score = self._get_heuristic_score(image_path)
-            
-            # Weighted combination
-            final_score = (clip_score * 0.6) + (heuristic_score * 0.4)
+            heuristic = heuristic_score(image_path, img, width, height, factor)
             
-            return min(max(final_score, 0.0), 1.0)
+            return self._combine_scores(clip_score, heuristic)
             
         except Exception as e:
             logger.error(f"Error scoring {image_path}: {e}")
             return 0.0
     
-    def _get_clip_score(self, image):
-        """Get CLIP semantic quality score using transformers"""
+    def score_memes(self, image_paths, batch_size=32):
+        """
+        Score many memes with one CLIP forward pass per batch
+        
+        Args:
+            image_paths: List of image files to score
+            batch_size: Images per CLIP forward pass
+        
+        Returns:
+            list: Quality scores aligned with image_paths (0.0 on failure)
+        """
+        if not image_paths:
+            return []
+        
+        scores = [0.0] * len(image_paths)
+        
+        # Decode + resize in worker processes while the previous batch runs on the model;
+        # a single batch has nothing to overlap with, and starting workers costs more than its decode
+        if len(image_paths) <= batch_size:
+            num_workers = 0
+        else:
+            num_workers = min((os.cpu_count() or 2) // 2, -(-len(image_paths) // batch_size))
+        loader = DataLoader(
+            MemeImageDataset(image_paths, self.resize_crop),
+            batch_size=batch_size,
+            num_workers=num_workers,
+            pin_memory=self.device == "cuda",
+            prefetch_factor=2 if num_workers > 0 else None,
+            multiprocessing_context=WORKER_START_METHOD if num_workers > 0 else None
+        )
+        
+        clip_scores = np.full(len(image_paths), 0.5)
+        heuristics = np.zeros(len(image_paths))
+        loaded = np.zeros(len(image_paths), dtype=bool)
+        
+        for pixel_values, heuristic, indices, ok, errors in loader:
+            for index, error in zip(indices.tolist(), errors):
+                if error:
+                    logger.error(f"Error scoring {image_paths[index]}: {error}")
+            
+            ok = ok.numpy()
+            if not ok.any():
+                continue
+            
+            # Score the pinned batch as-is; placeholder slots are simply discarded
+            batch_scores = np.asarray(self._get_pixel_scores(pixel_values))
+            indices = indices.numpy()[ok]
+            clip_scores[indices] = batch_scores[ok]
+            heuristics[indices] = heuristic.numpy()[ok]
+            loaded[indices] = True
+        
+        for index in np.flatnonzero(loaded):
+            scores[index] = self._combine_scores(clip_scores[index], heuristics[index])
+        
+        return scores
+    
+    def _combine_scores(self, clip_score, heuristic):
+        """Weighted combination of CLIP and heuristic scores"""
+        final_score = (clip_score * 0.6) + (heuristic * 0.4)
+        
+        return min(max(final_score, 0.0), 1.0)
+    
+    def _get_pixel_scores(self, pixel_values):
+        """Get CLIP semantic quality scores for a uint8 [B, 3, H, W] batch"""
         try:
-            # Prepare inputs
-            all_texts = self.quality_texts + self.low_quality_texts
-            
-            inputs = self.processor(
-                text=all_texts,
-                images=image,
-                return_tensors="pt",
-                padding=True
-            ).to(self.device)
-            
-            # Get similarity scores
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                logits_per_image = outputs.logits_per_image
-                probs = logits_per_image.softmax(dim=1).cpu().numpy()[0]
+            if self.onnx_session is not None:
+                logits_per_image = self._get_onnx_logits(pixel_values)
+            else:
+                logits_per_image = self._get_torch_logits(pixel_values)
+            
+            # Softmax over prompts
+            logits_per_image = logits_per_image - logits_per_image.max(axis=1, keepdims=True)
+            probs = np.exp(logits_per_image)
+            probs /= probs.sum(axis=1, keepdims=True)
             
             # Calculate score
-            quality_score = np.mean(probs[:len(self.quality_texts)])
-            low_quality_score = np.mean(probs[len(self.quality_texts):])
+            quality_scores = probs[:, :len(self.quality_texts)].mean(axis=1)
+            low_quality_scores = probs[:, len(self.quality_texts):].mean(axis=1)
             
             # Normalize
-            score = quality_score / (quality_score + low_quality_score)
+            scores = quality_scores / (quality_scores + low_quality_scores)
             
-            return score
+            return scores.tolist()
             
         except Exception as e:
             logger.error(f"CLIP scoring error: {e}")
-            return 0.5
+            return [0.5] * len(pixel_values)
     
-    def _get_heuristic_score(self, image_path):
-        """Heuristic quality based on image properties"""
-        try:
-            img = cv2.imread(image_path)
-            
-            if img is None:
-                return 0.3
-            
-            score = 0.5
-            
-            # Resolution
-            height, width = img.shape[:2]
-            pixels = height * width
-            
-            if pixels >= 1920 * 1080:
-                score += 0.15
-            elif pixels >= 1280 * 720:
-                score += 0.10
-            elif pixels < 400 * 400:
-                score -= 0.20
-            
-            # Aspect ratio
-            aspect = width / height
-            if 0.8 <= aspect <= 1.5:
-                score += 0.05
-            elif aspect < 0.5 or aspect > 3.0:
-                score -= 0.10
-            
-            # Sharpness (Laplacian variance)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-            
-            if laplacian_var > 500:
-                score += 0.10
-            elif laplacian_var < 100:
-                score -= 0.15
-            
-            # Color diversity
-            color_std = np.std(img)
-            
-            if color_std > 50:
-                score += 0.05
-            elif color_std < 20:
-                score -= 0.10
-            
-            return min(max(score, 0.0), 1.0)
+    def _normalize(self, pixel_values, dtype):
+        """Scale uint8 pixels to [0, 1] and apply CLIP mean/std"""
+        pixel_values = v2.functional.to_dtype(pixel_values, dtype, scale=True)
+        return v2.functional.normalize(pixel_values, CLIP_MEAN, CLIP_STD)
+    
+    def _get_torch_logits(self, pixel_values):
+        """Image-to-prompt logits from the PyTorch vision tower"""
+        # Ship uint8 to the device (4x fewer bytes) and normalize there
+        pixel_values = pixel_values.to(self.device, non_blocking=True)
+        pixel_values = self._normalize(pixel_values, self.dtype)
+        
+        batch_size = pixel_values.shape[0]
+        if self._compiled:
+            # Pad to a fixed bucket so the captured graph is replayed, not recompiled
+            bucket = next((b for b in BATCH_BUCKETS if b >= batch_size), batch_size)
+            if bucket > batch_size:
+                padding = pixel_values.new_zeros((bucket - batch_size, *pixel_values.shape[1:]))
+                pixel_values = torch.cat([pixel_values, padding])
+        
+        # CPU autocast rejects float32 with a warning even when disabled, so skip it there
+        if self.device == "cuda":
+            autocast = torch.autocast(self.device, dtype=self.dtype)
+        else:
+            autocast = contextlib.nullcontext()
+        
+        with torch.inference_mode(), autocast:
+            try:
+                image_embeds = self._vision_forward(pixel_values)
+            except Exception as e:
+                if not self._compiled:
+                    raise
+                logger.warning(f"torch.compile failed, using eager CLIP: {e}")
+                self._vision_forward, self._compiled = self._eager_vision_forward, False
+                image_embeds = self._vision_forward(pixel_values)
             
-        except Exception as e:
-            logger.error(f"Heuristic error: {e}")
-            return 0.5
+            image_embeds = F.normalize(image_embeds[:batch_size], dim=-1)
+            logits_per_image = self.logit_scale * image_embeds @ self.text_embeds.T
+        
+        return logits_per_image.float().cpu().numpy()
+    
+    def _get_onnx_logits(self, pixel_values):
+        """Image-to-prompt logits from the ONNX Runtime vision tower"""
+        batch = self._normalize(pixel_values, torch.float32).numpy()
+        
+        image_embeds = self.onnx_session.run(None, {"pixel_values": batch})[0]
+        image_embeds = image_embeds / np.linalg.norm(image_embeds, axis=-1, keepdims=True)
+        
+        return self.logit_scale_np * image_embeds @ self.text_embeds_np.T
+
+
+@functools.lru_cache(maxsize=1)
+def get_selector(model_name="openai/clip-vit-base-patch32", onnx_path="clip_vit.onnx",
+                 precision="auto"):
+    """Process-wide MemeSelector, loaded on first use"""
+    return MemeSelector(model_name, onnx_path=onnx_path, precision=precision)
 
 
 if __name__ == "__main__":
@@ -170,7 +536,7 @@ if __name__ == "__main__":
     
     logging.basicConfig(level=logging.INFO)
     
-    selector = MemeSelector()
+    selector = get_selector()
     score = selector.score_meme(sys.argv[1])
     
     print(f"\n{'='*50}")
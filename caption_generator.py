@@ -1,6 +1,8 @@
 import random
-import json
 import logging
+import functools
+
+from config_loader import load_json_config
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +15,19 @@ except ImportError:
     logger.warning("Transformers not available, using template captions")
 
 
+@functools.lru_cache(maxsize=1)
+def _load_caption_model():
+    """Process-wide distilgpt2 pipeline, shared by every CaptionGenerator"""
+    logger.info("Loading AI caption model...")
+    model = pipeline(
+        "text-generation",
+        model="distilgpt2",
+        pad_token_id=50256
+    )
+    logger.info("✅ AI caption model loaded")
+    return model
+
+
 class CaptionGenerator:
     """Generates captions - AI or template-based"""
     
@@ -21,19 +36,6 @@ class CaptionGenerator:
         self.caption_config = self.config.get("caption_generator", {})
         self.use_ai = self.caption_config.get("use_ai", False) and AI_AVAILABLE
         
-        if self.use_ai:
-            logger.info("Loading AI caption model...")
-            try:
-                self.ai_model = pipeline(
-                    "text-generation",
-                    model="distilgpt2",
-                    pad_token_id=50256
-                )
-                logger.info("✅ AI caption model loaded")
-            except Exception as e:
-                logger.error(f"AI model failed: {e}")
-                self.use_ai = False
-        
         # Fallback templates
         self.templates = {
             "casual": [
@@ -50,25 +52,38 @@ class CaptionGenerator:
             ]
         }
         
+        # Tuples: immutable pools sampled on every caption
         self.hashtag_pools = {
-            "generic": ["#memes", "#funny", "#dankmemes", "#lol", "#viral", "#comedy"],
-            "quality": ["#bestmemes", "#topmemes", "#funnycontent"],
-            "engagement": ["#relatable", "#mood", "#trending", "#fyp"]
+            "generic": ("#memes", "#funny", "#dankmemes", "#lol", "#viral", "#comedy"),
+            "quality": ("#bestmemes", "#topmemes", "#funnycontent"),
+            "engagement": ("#relatable", "#mood", "#trending", "#fyp")
         }
         
+        # Per-instance RNG avoids contention on the shared module-level one
+        self._rng = random.Random()
+        
         self.emojis = ["😂", "💀", "🤣", "😭", "🔥", "💯"]
     
+    @functools.cached_property
+    def ai_model(self):
+        """Caption model, loaded on the first AI caption"""
+        try:
+            return _load_caption_model()
+        except Exception as e:
+            logger.error(f"AI model failed: {e}")
+            self.use_ai = False
+            return None
+    
     def _load_config(self, config_path):
         try:
-            with open(config_path, 'r') as f:
-                return json.load(f)
+            return load_json_config(config_path)
         except:
             return {}
     
     def generate(self, metadata=None, ai_score=0.7):
         """Generate caption"""
         
-        if self.use_ai:
+        if self.use_ai and self.ai_model is not None:
             caption_text = self._generate_ai_caption(metadata)
         else:
             caption_text = self._generate_template_caption(metadata, ai_score)
@@ -127,17 +142,25 @@ class CaptionGenerator:
         return title[:50] if title else "see this"
     
     def _generate_hashtags(self, metadata, ai_score):
-        selected = random.sample(self.hashtag_pools["generic"], 4)
+        selected = self._rng.sample(self.hashtag_pools["generic"], 4)
         
         if ai_score >= 0.75:
-            selected.extend(random.sample(self.hashtag_pools["quality"], 2))
+            selected.extend(self._rng.sample(self.hashtag_pools["quality"], 2))
         
-        selected.extend(random.sample(self.hashtag_pools["engagement"], 2))
+        selected.extend(self._rng.sample(self.hashtag_pools["engagement"], 2))
         
         if metadata and "subreddit" in metadata:
             selected.append(f"#{metadata['subreddit'].lower()}")
         
-        return " ".join(list(dict.fromkeys(selected))[:10])
+        # Single ordered dedup pass
+        seen = set()
+        unique = []
+        for tag in selected:
+            if tag not in seen:
+                seen.add(tag)
+                unique.append(tag)
+        
+        return " ".join(unique[:10])
 
 
 if __name__ == "__main__":
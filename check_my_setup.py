@@ -3,6 +3,7 @@
 
 import os
 import sys
+import importlib.util
 
 print("🔍 CHECKING YOUR SETUP")
 print("=" * 70)
@@ -20,12 +21,22 @@ deps = {
     'dotenv': 'pip install python-dotenv'
 }
 
+def is_installed(dep):
+    """Check a (dotted) module is importable without running its init"""
+    parts = dep.split('.')
+    for i in range(1, len(parts) + 1):
+        try:
+            if importlib.util.find_spec('.'.join(parts[:i])) is None:
+                return False
+        except (ImportError, ValueError):
+            return False
+    return True
+
 missing = []
 for dep, install_cmd in deps.items():
-    try:
-        __import__(dep)
+    if is_installed(dep):
         print(f"  ✅ {dep}")
-    except ImportError:
+    else:
         print(f"  ❌ {dep} - Run: {install_cmd}")
         missing.append(dep)
 
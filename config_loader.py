@@ -0,0 +1,21 @@
+import functools
+import os
+
+import orjson
+
+
+@functools.lru_cache(maxsize=16)
+def _read_json_cached(path, mtime):
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers' handlers still apply
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+def load_json_config(config_path):
+    """
+    Load a JSON config, parsing it again only when the file changes
+    
+    The returned dict is shared between callers; treat it as read-only.
+    """
+    path = os.path.abspath(config_path)
+    return _read_json_cached(path, os.path.getmtime(path))
@@ -1,13 +1,22 @@
 import discord
 from discord.ext import commands
+import asyncio
 import json
 import os
 from datetime import datetime
 from pathlib import Path
 import logging
+from collections import deque
+from hashlib import md5
+from xxhash import xxh3_64_hexdigest
+
+from config_loader import load_json_config
 
 logger = logging.getLogger(__name__)
 
+# 1: md5 content ids, 2: xxh3 content ids
+HISTORY_SCHEMA_VERSION = 2
+
 class DiscordPublisher:
     """Handles posting AI-selected content to Discord"""
     
@@ -15,7 +24,11 @@ class DiscordPublisher:
         self.config = self._load_config(config_path)
         self.discord_config = self.config.get("discord", {})
         self.history_file = self.config.get("history", {}).get("discord_posted", "discord_posted_history.json")
+        self.max_entries = self.config.get("history", {}).get("max_history_entries", 1000)
+        self.compact_every = self.config.get("history", {}).get("compact_every", 50)
+        self._posts_since_compact = 0
         self.posted_history = self._load_history()
+        self._has_legacy_ids = self._check_legacy_ids()
         
         # Bot setup
         intents = discord.Intents.default()
@@ -27,8 +40,7 @@ class DiscordPublisher:
     def _load_config(self, config_path):
         """Load configuration file"""
         try:
-            with open(config_path, 'r') as f:
-                return json.load(f)
+            return load_json_config(config_path)
         except FileNotFoundError:
             logger.error(f"Config file not found: {config_path}")
             raise
@@ -37,26 +49,67 @@ class DiscordPublisher:
             raise
     
     def _load_history(self):
-        """Load posting history to avoid duplicates"""
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                logger.warning("Corrupted history file, creating new one")
-                return {"posted": []}
-        return {"posted": []}
-    
-    def _save_history(self):
-        """Save posting history"""
-        max_entries = self.config.get("history", {}).get("max_history_entries", 1000)
+        """Load posting history (one JSON entry per line) to avoid duplicates"""
+        # Capped in O(1) per append; the oldest entries fall off automatically
+        entries = deque(maxlen=self.max_entries)
+        history = {"ids": set(), "entries": entries}
+        
+        if not os.path.exists(self.history_file):
+            return history
+        
+        with open(self.history_file, 'r') as f:
+            first_line = f.readline()
+            
+            # Older versions wrote a single {"posted": [...]} document
+            if first_line.strip() == "{" or first_line.startswith('{"posted"'):
+                try:
+                    f.seek(0)
+                    entries.extend(json.load(f).get("posted", []))
+                except (json.JSONDecodeError, AttributeError):
+                    logger.warning("Corrupted history file, creating new one")
+                self.posted_history = history
+                self._compact_history()
+                return history
+            
+            f.seek(0)
+            lines_read = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                lines_read += 1
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning("Skipping corrupted history line")
         
-        # Trim history if too large
-        if len(self.posted_history["posted"]) > max_entries:
-            self.posted_history["posted"] = self.posted_history["posted"][-max_entries:]
+        history["ids"] = {entry["content_id"] for entry in entries}
+        
+        # Short-lived runs post far fewer than compact_every items, so the in-process
+        # counter never fires; trim the file on load once it outgrows the deque
+        if lines_read > self.max_entries + self.compact_every:
+            self.posted_history = history
+            self._compact_history()
+        
+        return history
+    
+    def _compact_history(self):
+        """Rewrite the history file with only the retained entries"""
+        entries = self.posted_history["entries"]
+        self.posted_history["ids"] = {entry["content_id"] for entry in entries}
         
         with open(self.history_file, 'w') as f:
-            json.dump(self.posted_history, f, indent=2)
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        
+        self._posts_since_compact = 0
+        self._has_legacy_ids = self._check_legacy_ids()
+    
+    def _check_legacy_ids(self):
+        """True while history still holds md5-era entries"""
+        return any(
+            entry.get("schema", 1) < HISTORY_SCHEMA_VERSION
+            for entry in self.posted_history["entries"]
+        )
     
     def _setup_events(self):
         """Setup bot event handlers"""
@@ -74,7 +127,48 @@ class DiscordPublisher:
     
     def is_already_posted(self, content_id):
         """Check if content was already posted"""
-        return content_id in [entry["content_id"] for entry in self.posted_history["posted"]]
+        return content_id in self.posted_history["ids"]
+    
+    def _is_duplicate(self, file_path):
+        """Check both the current and the legacy content id"""
+        return self.is_already_posted(self._generate_content_id(file_path)) or (
+            self._has_legacy_ids
+            and self.is_already_posted(self._generate_legacy_content_id(file_path))
+        )
+    
+    async def post_batch(self, items, max_in_flight=5):
+        """
+        Post several items concurrently
+        
+        Args:
+            items: List of post_content keyword-argument dicts
+            max_in_flight: Concurrent uploads, kept within the per-channel rate limit
+        
+        Returns:
+            list: Success flags aligned with items
+        """
+        semaphore = asyncio.Semaphore(max_in_flight)
+        scheduled = set()
+        
+        async def post_one(item):
+            async with semaphore:
+                return await self.post_content(**item)
+        
+        async def skip():
+            return False
+        
+        tasks = []
+        for item in items:
+            # Dedup up front so duplicates are never scheduled
+            content_id = self._generate_content_id(item["file_path"])
+            if content_id in scheduled or self._is_duplicate(item["file_path"]):
+                logger.info(f"Content already posted: {content_id}")
+                tasks.append(skip())
+                continue
+            scheduled.add(content_id)
+            tasks.append(post_one(item))
+        
+        return await asyncio.gather(*tasks)
     
     async def post_content(self, 
                           file_path, 
@@ -100,7 +194,7 @@ class DiscordPublisher:
             
             # Check if already posted
             content_id = self._generate_content_id(file_path)
-            if self.is_already_posted(content_id):
+            if self._is_duplicate(file_path):
                 logger.info(f"Content already posted: {content_id}")
                 return False
             
@@ -125,9 +219,15 @@ class DiscordPublisher:
             
             embed.set_footer(text="AI Content Pipeline v2.0")
             
-            # Send file + embed
-            file = discord.File(file_path)
-            message = await channel.send(file=file, embed=embed)
+            # Send file + embed (opening the file stays off the event loop);
+            # a 1MB buffer reads each upload in a few large syscalls
+            fp = await asyncio.to_thread(open, file_path, 'rb', buffering=1 << 20)
+            try:
+                file = discord.File(fp, filename=os.path.basename(file_path))
+                message = await channel.send(file=file, embed=embed)
+            finally:
+                # discord.File only closes files it opened itself
+                fp.close()
             
             # Add reactions if enabled
             if self.discord_config.get("enable_reactions", True):
@@ -153,7 +253,11 @@ class DiscordPublisher:
     
     def _generate_content_id(self, file_path):
         """Generate unique ID for content"""
-        from hashlib import md5
+        filename = Path(file_path).name
+        return xxh3_64_hexdigest(filename.encode())
+    
+    def _generate_legacy_content_id(self, file_path):
+        """Schema 1 id, still matched while old entries remain in history"""
         filename = Path(file_path).name
         return md5(filename.encode()).hexdigest()[:16]
     
@@ -170,13 +274,22 @@ class DiscordPublisher:
         """Record successful post in history"""
         entry = {
             "content_id": content_id,
+            "schema": HISTORY_SCHEMA_VERSION,
             "file_path": file_path,
             "ai_score": ai_score,
             "timestamp": datetime.now().isoformat(),
             "metadata": metadata or {}
         }
-        self.posted_history["posted"].append(entry)
-        self._save_history()
+        self.posted_history["entries"].append(entry)
+        self.posted_history["ids"].add(content_id)
+        
+        # Append-only write; the full rewrite happens once every compact_every posts
+        with open(self.history_file, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+        
+        self._posts_since_compact += 1
+        if self._posts_since_compact >= self.compact_every:
+            self._compact_history()
     
     def run(self, token=None):
         """Start the Discord bot"""
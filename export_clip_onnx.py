@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Export the CLIP vision tower to ONNX for ONNX Runtime / TensorRT inference
+MemeSelector picks up clip_vit.onnx automatically when onnxruntime is installed
+"""
+
+import sys
+import logging
+
+import torch
+from transformers import CLIPModel
+
+logger = logging.getLogger(__name__)
+
+
+class CLIPImageFeatures(torch.nn.Module):
+    """Vision tower + projection, equivalent to CLIPModel.get_image_features"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.vision_model = model.vision_model
+        self.visual_projection = model.visual_projection
+
+    def forward(self, pixel_values):
+        pooled_output = self.vision_model(pixel_values=pixel_values).pooler_output
+        return self.visual_projection(pooled_output)
+
+
+def export(model_name="openai/clip-vit-base-patch32", output_path="clip_vit.onnx"):
+    """Export the image feature graph with a dynamic batch axis"""
+    logger.info(f"Loading {model_name}...")
+    model = CLIPModel.from_pretrained(model_name).eval()
+    wrapper = CLIPImageFeatures(model).eval()
+
+    size = model.config.vision_config.image_size
+    dummy_pixel_values = torch.randn(1, 3, size, size)
+
+    # no_grad, not inference_mode: tracing needs version counters on the tensors
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            dummy_pixel_values,
+            output_path,
+            input_names=["pixel_values"],
+            output_names=["image_embeds"],
+            opset_version=14,
+            dynamic_axes={"pixel_values": {0: "B"}, "image_embeds": {0: "B"}}
+        )
+
+    # Symbolic shape inference lets the TensorRT provider build fused engines
+    try:
+        import onnx
+        from onnxruntime.tools.symbolic_shape_infer import SymbolicShapeInference
+
+        inferred = SymbolicShapeInference.infer_shapes(onnx.load(output_path), auto_merge=True)
+        onnx.save(inferred, output_path)
+    except ImportError:
+        logger.warning("onnx/onnxruntime not installed, skipping shape inference")
+
+    logger.info(f"✅ Exported CLIP vision tower to {output_path}")
+    return output_path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) > 2:
+        export(sys.argv[1], sys.argv[2])
+    elif len(sys.argv) > 1:
+        export(sys.argv[1])
+    else:
+        export()
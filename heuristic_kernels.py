@@ -0,0 +1,79 @@
+import numpy as np
+import cv2
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Try to import numba for the fused kernel
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    logger.warning("Numba not available, using OpenCV heuristic stats")
+
+
+if NUMBA_AVAILABLE:
+    # Serial: this runs inside DataLoader workers, which already supply the
+    # parallelism, and numba's threading layers aren't fork-safe once initialised
+    @njit(fastmath=True, cache=True)
+    def _fused_lap_var_and_std(gray, bgr):
+        """Laplacian variance of gray and std of bgr in one pass, no temporaries"""
+        height, width = gray.shape
+        lap_sum = 0.0
+        lap_sq = 0.0
+        px_sum = 0.0
+        px_sq = 0.0
+
+        for y in range(height):
+            # BORDER_REFLECT_101, same as cv2.Laplacian
+            up = y - 1 if y > 0 else 1
+            down = y + 1 if y < height - 1 else height - 2
+
+            for x in range(width):
+                left = x - 1 if x > 0 else 1
+                right = x + 1 if x < width - 1 else width - 2
+
+                center = np.float64(gray[y, x])
+                response = (
+                    np.float64(gray[up, x]) + np.float64(gray[down, x])
+                    + np.float64(gray[y, left]) + np.float64(gray[y, right])
+                    - 4.0 * center
+                )
+                lap_sum += response
+                lap_sq += response * response
+
+                for channel in range(3):
+                    value = np.float64(bgr[y, x, channel])
+                    px_sum += value
+                    px_sq += value * value
+
+        count = height * width
+        lap_mean = lap_sum / count
+        lap_var = lap_sq / count - lap_mean * lap_mean
+
+        px_mean = px_sum / (count * 3)
+        px_var = px_sq / (count * 3) - px_mean * px_mean
+
+        return lap_var, np.sqrt(max(px_var, 0.0))
+
+
+def lap_var_and_std(gray, bgr):
+    """
+    Sharpness and colour diversity stats for the heuristic scorer
+
+    Args:
+        gray: uint8 [H, W] grayscale image
+        bgr: uint8 [H, W, 3] colour image
+
+    Returns:
+        tuple: (Laplacian variance, colour std)
+    """
+    height, width = gray.shape
+
+    if NUMBA_AVAILABLE and height >= 2 and width >= 2:
+        return _fused_lap_var_and_std(
+            np.ascontiguousarray(gray), np.ascontiguousarray(bgr)
+        )
+
+    return cv2.Laplacian(gray, cv2.CV_32F).var(), bgr.std()
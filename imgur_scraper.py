@@ -1,159 +1,396 @@
-import requests
+import aiohttp
+import aiofiles
+import aiofiles.os
+import asyncio
 import os
-import json
-import time
+import re
+import orjson
+import atexit
+from pathlib import Path
+from blake3 import blake3
+
+# Sent only to api.imgur.com; image hosts get the plain session headers.
+# No Accept-Encoding: aiohttp's default already offers br when Brotli is installed
+API_HEADERS = {
+    'Authorization': 'Client-ID 546c25a59c58ad7',
+}
+
+# Validators + parsed posts per feed URL, reused when Imgur answers 304
+ETAG_CACHE_FILE = Path.home() / '.cache' / 'imgur_etags.json'
+
+# Image extension anywhere in the link, e.g. .jpg or .png?fb
+_EXT_RE = re.compile(r'\.(jpe?g|png|gif|webp)\b', re.I)
+
+# Imgur ids already on disk, kept across restarts
+DOWNLOADED_IDS_FILE = 'downloaded_ids.json'
+
+# blake3 digests of downloaded images, catching reuploads under new ids
+CONTENT_HASHES_FILE = 'content_hashes.json'
+
+# Transient API statuses retried with exponential backoff
+RETRY_STATUSES = {429, 502, 503, 504}
 
 class ImgurMemeScraper:
-    def __init__(self, config_file='config_no_api.json'):
+    def __init__(self):
         self.download_folder = 'memes'
-        self.downloaded_ids = set()
+        self.downloaded_ids = self._load_downloaded_ids()
+        self.content_hashes = self._load_content_hashes()
+        
+        # Concurrent image downloads per scrape
+        self.max_concurrent_downloads = 15
+        
+        # API retry policy
+        self.api_retries = 3
+        self.api_backoff = 0.3
+        
+        # Back off before the next fetch once fewer user credits than this remain
+        self.rate_limit_floor = 50
+        self.rate_limit_backoff = 60
+        self._api_remaining = None
         
         os.makedirs(self.download_folder, exist_ok=True)
         
-        self.session = requests.Session()
-        self.session.headers.update({
+        self._etags = self._load_etags()
+        atexit.register(self._save_etags)
+        atexit.register(self._save_downloaded_ids)
+        atexit.register(self._save_content_hashes)
+        
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        })
+        }
+    
+    def _new_session(self):
+        """One keep-alive connection pool shared by the API fetch and downloads"""
+        connector = aiohttp.TCPConnector(limit=20, keepalive_timeout=30)
+        return aiohttp.ClientSession(connector=connector, headers=self.headers)
+    
+    def _load_downloaded_ids(self):
+        try:
+            with open(DOWNLOADED_IDS_FILE, 'rb') as f:
+                return set(orjson.loads(f.read()))
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return set()
+    
+    def _save_downloaded_ids(self):
+        try:
+            with open(DOWNLOADED_IDS_FILE, 'wb') as f:
+                f.write(orjson.dumps(list(self.downloaded_ids)))
+        except OSError as e:
+            print(f"  Could not save downloaded ids: {e}")
+    
+    def _load_content_hashes(self):
+        try:
+            with open(CONTENT_HASHES_FILE, 'rb') as f:
+                return set(orjson.loads(f.read()))
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return set()
+    
+    def _save_content_hashes(self):
+        try:
+            with open(CONTENT_HASHES_FILE, 'wb') as f:
+                f.write(orjson.dumps(list(self.content_hashes)))
+        except OSError as e:
+            print(f"  Could not save content hashes: {e}")
+    
+    def _load_etags(self):
+        try:
+            with open(ETAG_CACHE_FILE, 'rb') as f:
+                return orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return {}
+    
+    def _save_etags(self):
+        try:
+            ETAG_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(ETAG_CACHE_FILE, 'wb') as f:
+                f.write(orjson.dumps(self._etags))
+        except OSError as e:
+            print(f"  Could not save Imgur ETag cache: {e}")
     
     def fetch_imgur_posts(self):
+        """Fetch viral images from Imgur (sync wrapper)"""
+        async def run():
+            async with self._new_session() as session:
+                return await self.fetch_imgur_posts_async(session)
+        
+        return asyncio.run(run())
+    
+    async def fetch_imgur_posts_async(self, session):
         """Fetch viral images from Imgur"""
-        all_posts = []
+        # Only wait when the last response said the credit pool is nearly spent
+        if self._api_remaining is not None and self._api_remaining < self.rate_limit_floor:
+            print(f"  Imgur credits low ({self._api_remaining}), backing off {self.rate_limit_backoff}s")
+            await asyncio.sleep(self.rate_limit_backoff)
+        
+        # hot and top/day overlap heavily; keyed by id so each post is queued once
+        all_posts = {}
         
         urls = [
             'https://api.imgur.com/3/gallery/hot/viral/0.json',
             'https://api.imgur.com/3/gallery/top/viral/day/0.json',
         ]
         
-        headers = {
-            'Authorization': 'Client-ID 546c25a59c58ad7',
-        }
+        # Both feeds in flight at once over the shared session
+        results = await asyncio.gather(
+            *(self._fetch_feed(session, url) for url in urls),
+            return_exceptions=True
+        )
         
-        for url in urls:
-            try:
-                time.sleep(1)
-                response = self.session.get(url, headers=headers, timeout=30)
+        for posts in results:
+            if isinstance(posts, Exception):
+                print(f"  Imgur fetch error: {posts}")
+                continue
+            
+            for post in posts:
+                # Known ids never reach the download stage
+                if post['id'] in self.downloaded_ids:
+                    continue
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    items = data.get('data', [])
-                    print(f"  Found {len(items)} items from Imgur")
-                    
-                    for item in items:
-                        try:
-                            # Handle albums - get first image
-                            if item.get('is_album', False):
-                                images = item.get('images', [])
-                                if images:
-                                    first_img = images[0]
-                                    link = first_img.get('link', '')
-                                    img_type = first_img.get('type', '')
-                                else:
-                                    continue
-                            else:
-                                link = item.get('link', '')
-                                img_type = item.get('type', '')
-                            
-                            # Skip videos
-                            if 'video' in img_type:
-                                continue
-                            
-                            # Must be an image
-                            if not link:
-                                continue
-                            
-                            if not any(ext in link.lower() for ext in ['.jpg', '.png', '.gif', '.jpeg', '.webp']):
-                                # Try adding .jpg
-                                if 'imgur.com' in link:
-                                    link = link + '.jpg'
-                                else:
-                                    continue
-                            
-                            all_posts.append({
-                                'id': item.get('id', ''),
-                                'title': item.get('title', '') or 'Untitled',
-                                'link': link,
-                                'ups': item.get('ups', 0) or item.get('points', 0) or 0,
-                            })
-                            
-                        except Exception as e:
-                            continue
-                            
+                # Keep the higher-voted copy when a post is in both feeds
+                existing = all_posts.get(post['id'])
+                if existing is None or post['ups'] > existing['ups']:
+                    all_posts[post['id']] = post
+        
+        print(f"  Total valid posts: {len(all_posts)}")
+        return list(all_posts.values())
+    
+    async def _fetch_feed(self, session, url):
+        """Parsed posts for one gallery URL (cached posts on 304)"""
+        status, data, validators = await self._get_api_json(session, url)
+        
+        if status == 304:
+            # Feed unchanged since last cycle: no download, no parse
+            posts = self._etags[url]['posts']
+            print(f"  Imgur feed unchanged, reusing {len(posts)} posts")
+            return posts
+        
+        if data is None:
+            return []
+        
+        items = data.get('data', [])
+        print(f"  Found {len(items)} items from Imgur")
+        
+        posts = []
+        for item in items:
+            try:
+                post = self._parse_item(item)
+                if post:
+                    posts.append(post)
             except Exception as e:
-                print(f"  Imgur fetch error: {e}")
                 continue
         
-        print(f"  Total valid posts: {len(all_posts)}")
-        return all_posts
+        if validators:
+            self._etags[url] = {**validators, 'posts': posts}
+        
+        return posts
+    
+    async def _get_api_json(self, session, url):
+        """
+        GET an API endpoint, retrying transient errors
+        
+        Returns:
+            tuple: (status, parsed JSON or None, cache validators for the response)
+        """
+        headers = dict(API_HEADERS)
+        cached = self._etags.get(url)
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        
+        for attempt in range(self.api_retries + 1):
+            async with session.get(
+                url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status in RETRY_STATUSES and attempt < self.api_retries:
+                    await asyncio.sleep(self.api_backoff * 2 ** attempt)
+                    continue
+                
+                remaining = response.headers.get('X-RateLimit-UserRemaining')
+                if remaining is not None and remaining.isdigit():
+                    self._api_remaining = int(remaining)
+                
+                if response.status == 304 and cached:
+                    return 304, None, None
+                
+                if response.status != 200:
+                    return response.status, None, None
+                
+                validators = {
+                    key: value for key, value in (
+                        ('etag', response.headers.get('ETag')),
+                        ('last_modified', response.headers.get('Last-Modified')),
+                    ) if value
+                }
+                return 200, orjson.loads(await response.read()), validators
+        
+        return None, None, None
     
-    def download_image(self, url, filename):
+    def _parse_item(self, item):
+        """Gallery item -> post dict, or None if it isn't a usable image"""
+        # Handle albums - get first image
+        if item.get('is_album', False):
+            images = item.get('images', [])
+            if images:
+                first_img = images[0]
+                link = first_img.get('link', '')
+                img_type = first_img.get('type', '')
+            else:
+                return None
+        else:
+            link = item.get('link', '')
+            img_type = item.get('type', '')
+        
+        # Skip videos
+        if 'video' in img_type:
+            return None
+        
+        # Must be an image
+        if not link:
+            return None
+        
+        match = _EXT_RE.search(link)
+        if match:
+            ext = '.' + match.group(1).lower()
+        elif 'imgur.com' in link:
+            # Try adding .jpg
+            link = link + '.jpg'
+            ext = '.jpg'
+        else:
+            return None
+        
+        return {
+            'id': item.get('id', ''),
+            'title': item.get('title', '') or 'Untitled',
+            'link': link,
+            'ext': ext,
+            'ups': item.get('ups', 0) or item.get('points', 0) or 0,
+        }
+    
+    async def _download_image(self, session, url, filename, post_id=None):
+        filepath = os.path.join(self.download_folder, filename)
+        opened = False
+        
         try:
-            response = self.session.get(url, timeout=20)
-            response.raise_for_status()
+            # Images are already compressed, so ask for identity encoding
+            async with session.get(
+                url,
+                headers={'Accept-Encoding': 'identity'},
+                timeout=aiohttp.ClientTimeout(total=20)
+            ) as response:
+                response.raise_for_status()
+                
+                # Reject tiny responses before touching the disk
+                if response.content_length is not None and response.content_length <= 5000:
+                    return None
+                
+                # Stream to disk in 64KB chunks; aiofiles keeps the writes off the event loop
+                # and the content hash is updated per chunk, so the file is never re-read
+                written = 0
+                hasher = blake3()
+                async with aiofiles.open(filepath, 'wb') as f:
+                    opened = True
+                    async for chunk in response.content.iter_chunked(65536):
+                        await f.write(chunk)
+                        hasher.update(chunk)
+                        written += len(chunk)
             
-            filepath = os.path.join(self.download_folder, filename)
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+            if written <= 5000:  # At least 5KB
+                await aiofiles.os.remove(filepath)
+                return None
             
-            size = os.path.getsize(filepath)
-            if size > 5000:  # At least 5KB
-                return filepath
-            else:
-                os.remove(filepath)
+            # Same bytes under a different Imgur id: don't score it twice
+            digest = hasher.hexdigest()
+            if digest in self.content_hashes:
+                await aiofiles.os.remove(filepath)
+                if post_id:
+                    self.downloaded_ids.add(post_id)
                 return None
+            self.content_hashes.add(digest)
+            
+            return filepath
         except Exception as e:
+            if opened and os.path.exists(filepath):
+                os.remove(filepath)
             return None
     
     def scrape_subreddit(self, subreddit='imgur', sort_by='top', limit=30):
+        """Sync wrapper around scrape_subreddit_async"""
+        return asyncio.run(self.scrape_subreddit_async(subreddit, sort_by, limit))
+    
+    async def scrape_subreddit_async(self, subreddit='imgur', sort_by='top', limit=30):
         print(f"\n📥 Scraping Imgur viral memes...")
         
-        posts = self.fetch_imgur_posts()
-        
-        if not posts:
-            print("  No posts found after filtering")
-            return []
-        
-        print(f"  Attempting to download {min(len(posts), limit)} memes...")
+        async with self._new_session() as session:
+            posts = await self.fetch_imgur_posts_async(session)
+            
+            if not posts:
+                print("  No posts found after filtering")
+                return []
+            
+            print(f"  Attempting to download {min(len(posts), limit)} memes...")
+            
+            downloaded = await self._download_all(session, posts, limit)
         
+        print(f"  Downloaded: {len(downloaded)} memes")
+        return downloaded
+    
+    async def _download_all(self, session, posts, limit):
+        """Download until limit fresh memes are on disk, concurrently over the shared session"""
+        # Filter known ids once, so duplicates don't eat into the limit
+        pending = iter([post for post in posts if post['id'] not in self.downloaded_ids])
         downloaded = []
+        in_flight = 0
         
-        for post in posts[:limit]:
-            try:
-                post_id = post['id']
-                
-                if post_id in self.downloaded_ids:
-                    continue
+        async def worker():
+            nonlocal in_flight
+            # Failed downloads free their slot for the next post, so we only stop short
+            # of limit when the feed runs out
+            while len(downloaded) + in_flight < limit:
+                post = next(pending, None)
+                if post is None:
+                    return
                 
-                title = post['title']
-                upvotes = post['ups']
-                image_url = post['link']
+                in_flight += 1
+                try:
+                    result = await self._download_post(session, post)
+                finally:
+                    in_flight -= 1
                 
-                # Determine extension
-                ext = '.jpg'
-                for e in ['.png', '.gif', '.webp', '.jpeg']:
-                    if e in image_url.lower():
-                        ext = e
-                        break
-                
-                filename = f"imgur_{post_id}{ext}"
-                filepath = self.download_image(image_url, filename)
-                
-                if filepath:
-                    self.downloaded_ids.add(post_id)
-                    downloaded.append({
-                        'filepath': filepath,
-                        'title': title,
-                        'upvotes': upvotes,
-                        'post_id': post_id
-                    })
-                    print(f"  ✓ {title[:40]}... (↑{upvotes})")
-                
-                time.sleep(0.3)
-                
-            except Exception as e:
-                continue
+                if result:
+                    downloaded.append(result)
+        
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(min(self.max_concurrent_downloads, limit)):
+                tg.create_task(worker())
         
-        print(f"  Downloaded: {len(downloaded)} memes")
         return downloaded
+    
+    async def _download_post(self, session, post):
+        try:
+            post_id = post['id']
+            title = post['title']
+            upvotes = post['ups']
+            image_url = post['link']
+            
+            filename = f"imgur_{post_id}{post.get('ext', '.jpg')}"
+            filepath = await self._download_image(session, image_url, filename, post_id)
+            
+            if not filepath:
+                return None
+            
+            self.downloaded_ids.add(post_id)
+            print(f"  ✓ {title[:40]}... (↑{upvotes})")
+            
+            return {
+                'filepath': filepath,
+                'title': title,
+                'upvotes': upvotes,
+                'post_id': post_id
+            }
+        except Exception as e:
+            return None
 
 
 RedditMemeScraper = ImgurMemeScraper
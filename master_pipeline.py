@@ -1,22 +1,40 @@
 import asyncio
+import atexit
 import logging
-import json
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
 from pathlib import Path
 import sys
 import concurrent.futures
 
-from ai_meme_selector import MemeSelector
+from ai_meme_selector import get_selector
 from imgur_scraper import ImgurMemeScraper
 from caption_generator import CaptionGenerator
 from discord_bot import DiscordPublisher
+from config_loader import load_json_config
+
+# libuv-backed event loop when available (not on Windows)
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+# Records are formatted and written on a listener thread so slow disks never stall the event loop
+_log_queue = queue.Queue(-1)
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_handlers = [logging.FileHandler('logs/pipeline.log'), logging.StreamHandler()]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+
+_log_listener = QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/pipeline.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
@@ -25,30 +43,25 @@ class MasterPipeline:
     def __init__(self, config_path="config_final.json"):
         logger.info("Initializing Master Pipeline...")
         
-        with open(config_path, 'r') as f:
-            self.config = json.load(f)
+        self.config = load_json_config(config_path)
+        
+        self.ai_config = self.config.get("ai_selector", {})
         
         # Use Imgur scraper instead of Reddit
         self.scraper = ImgurMemeScraper()
-        self.selector = MemeSelector()
+        self.selector = get_selector(precision=self.ai_config.get("clip_precision", "auto"))
         self.caption_gen = CaptionGenerator(config_path)
         self.discord = DiscordPublisher(config_path)
         
-        self.ai_config = self.config.get("ai_selector", {})
         self.min_score = self.ai_config.get("min_score_threshold", 0.65)
         self.max_daily = self.ai_config.get("max_daily_selections", 2)
         self.post_interval = self.config.get("discord", {}).get("post_interval_seconds", 60)
         
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        workers = min(8, os.cpu_count() or 2)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
         
         logger.info("✅ Pipeline initialized successfully")
     
-    def _scrape_sync(self, limit):
-        return self.scraper.scrape_subreddit(limit=limit)
-    
-    def _score_meme_sync(self, path):
-        return self.selector.score_meme(path)
-    
     async def run_cycle(self):
         logger.info("=" * 60)
         logger.info("Starting pipeline cycle")
@@ -62,11 +75,8 @@ class MasterPipeline:
             
             limit = self.config.get("reddit", {}).get("limit", 30)
             
-            memes = await loop.run_in_executor(
-                self.executor,
-                self._scrape_sync,
-                limit
-            )
+            # Network-bound, so it runs natively on the event loop
+            memes = await self.scraper.scrape_subreddit_async(limit=limit)
             
             if memes:
                 for meme in memes:
@@ -84,22 +94,22 @@ class MasterPipeline:
             logger.info("🤖 AI scoring content...")
             scored_content = []
             
-            for item in all_content:
-                try:
-                    score = await loop.run_in_executor(
-                        self.executor,
-                        self._score_meme_sync,
-                        item["local_path"]
-                    )
-                    
-                    if score >= self.min_score:
-                        item["ai_score"] = score
-                        scored_content.append(item)
-                        logger.info(f"✅ {score:.0%} | {item.get('title', '')[:50]}...")
-                        
-                except Exception as e:
-                    logger.error(f"Scoring error: {e}")
-                    continue
+            # One batched CLIP pass over the whole cycle instead of b=1 per meme
+            try:
+                scores = await loop.run_in_executor(
+                    self.executor,
+                    self.selector.score_memes,
+                    [item["local_path"] for item in all_content]
+                )
+            except Exception as e:
+                logger.error(f"Scoring error: {e}")
+                return
+            
+            for item, score in zip(all_content, scores):
+                if score >= self.min_score:
+                    item["ai_score"] = score
+                    scored_content.append(item)
+                    logger.info(f"✅ {score:.0%} | {item.get('title', '')[:50]}...")
             
             scored_content.sort(key=lambda x: x["ai_score"], reverse=True)
             selected = scored_content[:self.max_daily]
@@ -112,40 +122,63 @@ class MasterPipeline:
             
             logger.info("📝 Posting to Discord...")
             
-            posted = 0
+            posts = []
+            caption_template = {"title": "", "subreddit": "", "upvotes": 0}
+            post_template = {"source": "Imgur", "subreddit": "", "upvotes": 0}
+            
             for item in selected:
                 try:
+                    subreddit = item.get("subreddit", "")
+                    upvotes = item.get("upvotes", 0)
+                    
+                    caption_metadata = caption_template.copy()
+                    caption_metadata["title"] = item.get("title", "")
+                    caption_metadata["subreddit"] = subreddit
+                    caption_metadata["upvotes"] = upvotes
+                    
                     caption = self.caption_gen.generate(
-                        metadata={
-                            "title": item.get("title", ""),
-                            "subreddit": item.get("subreddit", ""),
-                            "upvotes": item.get("upvotes", 0)
-                        },
+                        metadata=caption_metadata,
                         ai_score=item["ai_score"]
                     )
                     
-                    success = await self.discord.post_content(
-                        file_path=item["local_path"],
-                        ai_score=item["ai_score"],
-                        caption=caption,
-                        metadata={
-                            "source": "Imgur",
-                            "subreddit": item.get("subreddit", ""),
-                            "upvotes": item.get("upvotes", 0)
-                        }
-                    )
+                    # The publisher stores this dict in its history, so each post gets a copy
+                    metadata = post_template.copy()
+                    metadata["subreddit"] = subreddit
+                    metadata["upvotes"] = upvotes
                     
-                    if success:
-                        posted += 1
-                        logger.info(f"✅ Posted {posted}/{len(selected)}")
-                        
-                        if posted < len(selected):
-                            await asyncio.sleep(self.post_interval)
+                    posts.append({
+                        "file_path": item["local_path"],
+                        "ai_score": item["ai_score"],
+                        "caption": caption,
+                        "metadata": metadata
+                    })
                     
                 except Exception as e:
-                    logger.error(f"Post error: {e}")
+                    logger.error(f"Caption error: {e}")
                     continue
             
+            posted = 0
+            
+            if self.post_interval <= 0:
+                # No spacing required, so overlap the uploads
+                results = await self.discord.post_batch(posts)
+                posted = sum(1 for success in results if success)
+            else:
+                for post in posts:
+                    try:
+                        success = await self.discord.post_content(**post)
+                        
+                        if success:
+                            posted += 1
+                            logger.info(f"✅ Posted {posted}/{len(selected)}")
+                            
+                            if posted < len(selected):
+                                await asyncio.sleep(self.post_interval)
+                        
+                    except Exception as e:
+                        logger.error(f"Post error: {e}")
+                        continue
+            
             logger.info(f"🎉 Cycle complete! Posted {posted} items")
             
         except Exception as e:
@@ -158,7 +191,10 @@ def main():
     pipeline = MasterPipeline()
     
     try:
-        asyncio.run(pipeline.run_cycle())
+        if UVLOOP_AVAILABLE:
+            uvloop.run(pipeline.run_cycle())
+        else:
+            asyncio.run(pipeline.run_cycle())
     except KeyboardInterrupt:
         logger.info("Shutting down...")
     except Exception as e:
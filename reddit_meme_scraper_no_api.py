@@ -4,31 +4,207 @@ Reddit Meme Scraper to Google Drive (No API Required)
 Scrapes popular and new memes from Reddit using web scraping and uploads them to Google Drive
 """
 
-import requests
+import aiohttp
+import aiofiles
+import asyncio
+import contextlib
+import mimetypes
 import os
-import json
+import orjson
 from dotenv import load_dotenv
 import re
-from datetime import datetime
+import html
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
-import pickle
+from googleapiclient.errors import HttpError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pybloom_live import ScalableBloomFilter
+from collections import deque
+from types import MappingProxyType
+import threading
 import time
 
 
+# aiohttp can only decode Content-Encoding: br when a brotli package is installed
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Retried with exponential backoff (or the server's Retry-After)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Drive 403 reasons worth backing off for; any other 403 (permissions, quota) is permanent
+DRIVE_RATE_LIMIT_REASONS = {'userRateLimitExceeded', 'rateLimitExceeded'}
+
+# Image extension at the end of the path, before any query string
+_EXT_RE = re.compile(r'\.(jpe?g|png|gif|webp)(?=$|\?)', re.I)
+
+
+class TokenBucket:
+    """Async token bucket: averages `rate` requests/sec, allows bursts of `burst`"""
+    
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        # Only waits when the bucket is empty, unlike a fixed sleep per request
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.last = time.monotonic()
+                self.tokens = 0
+            else:
+                self.tokens -= 1
+
+
+class DownloadHistory:
+    """
+    Post ids seen so far: a Bloom filter for the full history plus an exact
+    window of recent ids
+    
+    The filter never forgets an id (no false negatives); a ~0.1% false-positive
+    rate means the odd new post is skipped. Saving writes the filter plus at
+    most recent_size ids instead of the whole id list. Small bits of run state
+    (e.g. cached Drive folder ids) ride along in the same JSON via `state`.
+    """
+    
+    def __init__(self, bloom_file, recent_file, recent_size=10_000):
+        self.bloom_file = bloom_file
+        self.recent_file = recent_file
+        self.recent = deque(maxlen=recent_size)
+        self._recent_ids = set()
+        self.state = {}
+        
+        # Saves may run on worker threads; they all share the same temp file names
+        self._save_lock = threading.Lock()
+        
+        # A missing or unreadable filter (e.g. truncated by an older in-place save)
+        # means starting a fresh one, never failing construction
+        try:
+            with open(self.bloom_file, 'rb') as f:
+                self.bloom = ScalableBloomFilter.fromfile(f)
+        except FileNotFoundError:
+            self.bloom = ScalableBloomFilter(initial_capacity=100_000, error_rate=0.001)
+        except Exception as e:
+            print(f"⚠️  Could not read {self.bloom_file} ({e}), starting a fresh filter")
+            self.bloom = ScalableBloomFilter(initial_capacity=100_000, error_rate=0.001)
+        
+        try:
+            with open(self.recent_file, 'rb') as f:
+                data = orjson.loads(f.read())
+            
+            # Older versions wrote a bare list of every id; fold those into the filter
+            if isinstance(data, dict):
+                ids = data.pop('downloaded_ids', [])
+                self.state = data
+            else:
+                ids = data
+            
+            for post_id in ids:
+                self.add(post_id)
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass
+    
+    def __contains__(self, post_id):
+        # Exact recent window first, then the filter
+        return post_id in self._recent_ids or post_id in self.bloom
+    
+    def __len__(self):
+        return len(self.bloom)
+    
+    def add(self, post_id):
+        if post_id in self._recent_ids:
+            return
+        
+        if len(self.recent) == self.recent.maxlen:
+            self._recent_ids.discard(self.recent[0])
+        self.recent.append(post_id)
+        self._recent_ids.add(post_id)
+        self.bloom.add(post_id)
+    
+    def save(self):
+        self._write({**self.state, 'downloaded_ids': list(self.recent)})
+    
+    async def save_async(self):
+        """save() with the serialization and file writes on a worker thread"""
+        # Snapshot here: the deque can't be iterated while the loop appends to it
+        await asyncio.to_thread(self._write, {**self.state, 'downloaded_ids': list(self.recent)})
+    
+    def _write(self, data):
+        # Written aside then renamed over, so an interrupted save leaves the old file intact
+        with self._save_lock:
+            self._replace(self.bloom_file, self.bloom.tofile)
+            encoded = orjson.dumps(data)
+            self._replace(self.recent_file, lambda f: f.write(encoded))
+    
+    @staticmethod
+    def _replace(path, write):
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+
 class RedditMemeScraper:
+    # Set up headers to mimic a browser - more realistic; shared, read-only
+    HEADERS = MappingProxyType({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Accept-Encoding': 'gzip, deflate, br' if BROTLI_AVAILABLE else 'gzip, deflate',
+        'Connection': 'keep-alive',
+        'Referer': 'https://www.reddit.com/',
+        'Sec-Fetch-Dest': 'image',
+        'Sec-Fetch-Mode': 'no-cors',
+        'Sec-Fetch-Site': 'same-site',
+        'DNT': '1'
+    })
+    
+    # Listing fetches override these on top of HEADERS
+    _JSON_HEADERS = MappingProxyType({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        'Accept': 'application/json'
+    })
+    
     def __init__(self, config_file='config_no_api.json'):
         """Initialize the scraper with Google Drive credentials only"""
         # Load environment variables
         load_dotenv()
         
         self.config = self.load_config(config_file)
+        self.drive_creds = None
         self.drive_service = self.setup_google_drive()
+        
+        # googleapiclient's http object isn't thread-safe: one service per upload thread
+        self._drive_local = threading.local()
+        
+        # Drive upload tuning: lower both on slow or flaky networks
+        self.resumable_threshold = self.config.get('resumable_threshold_mb', 5) * 1024 * 1024
+        self.upload_chunk_size = self.config.get('upload_chunk_size_mb', 1) * 1024 * 1024
+        
         self.download_folder = self.config.get('download_folder', 'memes')
         self.history_file = 'downloaded_history.json'
+        self.bloom_file = 'history.bloom'
         
         # Create download folder if it doesn't exist
         if not os.path.exists(self.download_folder):
@@ -37,46 +213,104 @@ class RedditMemeScraper:
         # Load download history
         self.downloaded_ids = self.load_history()
         
-        # Create a session for better connection handling
-        self.session = requests.Session()
-        
-        # Set up headers to mimic a browser - more realistic
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Referer': 'https://www.reddit.com/',
-            'Sec-Fetch-Dest': 'image',
-            'Sec-Fetch-Mode': 'no-cors',
-            'Sec-Fetch-Site': 'same-site',
-            'DNT': '1'
-        }
-        self.session.headers.update(self.headers)
+        # Image downloads in flight at once, shared across subreddits
+        self.max_concurrent_downloads = self.config.get('max_concurrent_downloads', 16)
+        
+        # Pacing for Reddit requests (listings and images)
+        self.rate_limit = self.config.get('requests_per_second', 1.0)
+        self.rate_burst = self.config.get('request_burst', 5)
+        
+        # Retry policy shared by every GET
+        self.max_retries = 3
+        self.retry_backoff = 1
+    
+    def _new_session(self):
+        """One pooled session for the listing fetches and image downloads"""
+        # Connections to i.redd.it / preview.redd.it / i.imgur.com stay open and are
+        # reused, so only the first request per host pays the TLS handshake
+        connector = aiohttp.TCPConnector(limit=64, limit_per_host=8, keepalive_timeout=30)
+        return aiohttp.ClientSession(connector=connector, headers=self.HEADERS)
+    
+    @contextlib.asynccontextmanager
+    async def _get(self, session, url, headers=None):
+        """
+        GET with retries on connection errors, timeouts and RETRY_STATUSES
+        
+        Yields the response once it's a success; raises after max_retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            delay = self.retry_backoff * 2 ** attempt
+            
+            try:
+                response = await session.get(
+                    url, headers=headers, timeout=aiohttp.ClientTimeout(total=20),
+                    allow_redirects=True
+                )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            
+            if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._retry_after(response, delay)
+                response.release()
+                await asyncio.sleep(delay)
+                continue
+            
+            break
+        
+        try:
+            response.raise_for_status()
+            yield response
+        finally:
+            response.release()
+    
+    def _retry_after(self, response, delay):
+        """
+        Seconds to wait before retrying: the server's Retry-After (delta-seconds
+        or HTTP-date) when it parses, else delay; never beyond the backoff maximum
+        """
+        value = response.headers.get('Retry-After', '').strip()
+        if not value:
+            return delay
+        
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+                if retry_at.tzinfo is None:
+                    retry_at = retry_at.replace(tzinfo=timezone.utc)
+                seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError, IndexError):
+                return delay
+        
+        # A Retry-After of an hour would stall the whole scrape; cap it like our own backoff
+        return min(max(seconds, 0.0), self.retry_backoff * 2 ** self.max_retries)
     
     def load_history(self):
         """Load history of downloaded post IDs"""
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                return set()
-        return set()
+        return DownloadHistory(self.bloom_file, self.history_file)
     
     def save_history(self):
         """Save history of downloaded post IDs"""
         try:
-            with open(self.history_file, 'w') as f:
-                json.dump(list(self.downloaded_ids), f)
+            self.downloaded_ids.save()
+        except Exception as e:
+            print(f"Warning: Could not save history: {e}")
+    
+    async def save_history_async(self):
+        """save_history without blocking the event loop"""
+        try:
+            await self.downloaded_ids.save_async()
         except Exception as e:
             print(f"Warning: Could not save history: {e}")
     
     def load_config(self, config_file):
         """Load configuration from JSON file"""
-        with open(config_file, 'r') as f:
-            return json.load(f)
+        with open(config_file, 'rb') as f:
+            return orjson.loads(f.read())
     
     def setup_google_drive(self):
         """Setup Google Drive API connection"""
@@ -84,9 +318,15 @@ class RedditMemeScraper:
         creds = None
         
         # Token file stores the user's access and refresh tokens
-        if os.path.exists('token.pickle'):
+        if os.path.exists('token.json'):
+            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+        elif os.path.exists('token.pickle'):
+            # One-time migration from the old pickled token
+            import pickle
             with open('token.pickle', 'rb') as token:
                 creds = pickle.load(token)
+            with open('token.json', 'w') as token:
+                token.write(creds.to_json())
         
         # If there are no valid credentials, let the user log in
         if not creds or not creds.valid:
@@ -98,14 +338,43 @@ class RedditMemeScraper:
                 creds = flow.run_local_server(port=0)
             
             # Save the credentials for the next run
-            with open('token.pickle', 'wb') as token:
-                pickle.dump(creds, token)
+            with open('token.json', 'w') as token:
+                token.write(creds.to_json())
         
+        self.drive_creds = creds
         service = build('drive', 'v3', credentials=creds)
         return service
     
+    def _thread_drive_service(self):
+        """Drive service owned by the calling thread"""
+        service = getattr(self._drive_local, 'service', None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self.drive_creds)
+            self._drive_local.service = service
+        return service
+    
     def get_or_create_folder(self, folder_name):
         """Get or create a folder in Google Drive"""
+        folder_ids = self.downloaded_ids.state.setdefault('folder_ids', {})
+        
+        # Cheap id lookup for the folder we found last run
+        cached_id = folder_ids.get(folder_name)
+        if cached_id:
+            try:
+                folder = self.drive_service.files().get(
+                    fileId=cached_id, fields='id, trashed'
+                ).execute()
+                if not folder.get('trashed'):
+                    return cached_id
+            except HttpError:
+                pass
+        
+        folder_id = self._find_or_create_folder(folder_name)
+        folder_ids[folder_name] = folder_id
+        return folder_id
+    
+    def _find_or_create_folder(self, folder_name):
+        """Search Drive for the folder by name, creating it if missing"""
         # Search for the folder
         query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
         results = self.drive_service.files().list(q=query, fields="files(id, name)").execute()
@@ -122,91 +391,129 @@ class RedditMemeScraper:
             folder = self.drive_service.files().create(body=file_metadata, fields='id').execute()
             return folder.get('id')
     
-    def download_image(self, url, filename):
-        """Download image from URL with retry logic"""
-        max_retries = 2
-        
-        for attempt in range(max_retries):
-            try:
-                # Decode HTML entities in URL (fix &amp; issues)
-                import html
-                url = html.unescape(url)
-                
-                # Special handling for Reddit images - use session for better connection
-                response = self.session.get(url, timeout=20, allow_redirects=True)
-                response.raise_for_status()
-                
-                # Check if we got valid image data by size and content
-                if len(response.content) < 100:  # Too small to be a real image
-                    if attempt < max_retries - 1:
-                        time.sleep(1)
-                        continue
-                    print(f"  ✗ File too small")
-                    return None
+    async def _fetch_image(self, session, url, filename):
+        """Download image from URL"""
+        try:
+            # Decode HTML entities in URL (fix &amp; issues)
+            url = html.unescape(url)
+            
+            filepath = os.path.join(self.download_folder, filename)
+            
+            async with self._get(session, url) as response:
+                # Sniff the first bytes so a block page is rejected before the body is pulled;
+                # read() may hand back a short first chunk, so wait for all 16 (or EOF)
+                try:
+                    first = await response.content.readexactly(16)
+                except asyncio.IncompleteReadError as e:
+                    first = e.partial
                 
                 # Check if response looks like HTML (Reddit blocking us)
-                if response.content[:15].lower().startswith(b'<!doctype html') or response.content[:6].lower().startswith(b'<html'):
-                    if attempt < max_retries - 1:
-                        time.sleep(2)
-                        continue
+                if first[:15].lower().startswith(b'<!doctype html') or first[:6].lower().startswith(b'<html'):
                     print(f"  ✗ Got HTML instead of image (blocked)")
                     return None
                 
-                filepath = os.path.join(self.download_folder, filename)
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
+                # Stream the rest straight to disk; the image never sits whole in memory
+                written = len(first)
+                try:
+                    async with aiofiles.open(filepath, 'wb') as f:
+                        await f.write(first)
+                        async for chunk in response.content.iter_chunked(65536):
+                            await f.write(chunk)
+                            written += len(chunk)
+                except BaseException:
+                    # Don't leave a truncated image behind
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+                    raise
+            
+            # Check if we got valid image data by size
+            if written < 100:  # Too small to be a real image
+                os.remove(filepath)
+                print(f"  ✗ File too small")
+                return None
+            
+            # written counts what actually reached the file; no need to stat it again
+            return filepath
+                
+        except asyncio.TimeoutError:
+            print(f"  ✗ Timeout")
+            return None
+        except Exception as e:
+            print(f"  ✗ Error: {str(e)[:30]}")
+            return None
+    
+    def upload_to_drive(self, filepath, folder_id, max_retries=5):
+        """Upload file to Google Drive (safe to call from worker threads)"""
+        delay = 1
+        
+        for attempt in range(max_retries):
+            try:
+                file_metadata = {
+                    'name': os.path.basename(filepath),
+                    'parents': [folder_id]
+                }
                 
-                # Verify the file was written correctly
-                if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-                    return filepath
+                # Memes are usually under 2MB: one multipart request beats the
+                # resumable session-init + PUT round trips. Bigger files go resumable
+                # in checkpointable chunks so a flaky link only resends one chunk.
+                size = os.path.getsize(filepath)
+                mimetype = mimetypes.guess_type(filepath)[0] or 'image/jpeg'
+                if size > self.resumable_threshold:
+                    media = MediaFileUpload(
+                        filepath, mimetype=mimetype, resumable=True,
+                        chunksize=self.upload_chunk_size
+                    )
                 else:
-                    if attempt < max_retries - 1:
-                        time.sleep(1)
-                        continue
-                    print(f"  ✗ File write failed")
-                    return None
-                    
-            except requests.exceptions.Timeout:
-                if attempt < max_retries - 1:
-                    time.sleep(2)
+                    media = MediaFileUpload(filepath, mimetype=mimetype, resumable=False)
+                file = self._thread_drive_service().files().create(
+                    body=file_metadata,
+                    media_body=media,
+                    fields='id'
+                ).execute()
+                
+                # Built locally; asking Drive for webViewLink costs a permission check
+                print(f"✓ Uploaded: {os.path.basename(filepath)}")
+                return f"https://drive.google.com/file/d/{file['id']}/view"
+            except HttpError as e:
+                # 403 userRateLimitExceeded / 429: back off and retry
+                if self._is_drive_rate_limit(e) and attempt < max_retries - 1:
+                    time.sleep(delay)
+                    delay *= 2
                     continue
-                print(f"  ✗ Timeout")
+                print(f"Error uploading {filepath}: {e}")
                 return None
             except Exception as e:
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                print(f"  ✗ Error: {str(e)[:30]}")
+                print(f"Error uploading {filepath}: {e}")
                 return None
         
         return None
     
-    def upload_to_drive(self, filepath, folder_id):
-        """Upload file to Google Drive"""
-        try:
-            file_metadata = {
-                'name': os.path.basename(filepath),
-                'parents': [folder_id]
-            }
-            
-            media = MediaFileUpload(filepath, resumable=True)
-            file = self.drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id, webViewLink'
-            ).execute()
-            
-            print(f"✓ Uploaded: {os.path.basename(filepath)}")
-            return file.get('webViewLink')
-        except Exception as e:
-            print(f"Error uploading {filepath}: {e}")
-            return None
+    @staticmethod
+    def _is_drive_rate_limit(error):
+        """True for 429 and the rate-limit flavours of 403"""
+        if error.resp.status == 429:
+            return True
+        if error.resp.status != 403:
+            return False
+        
+        details = getattr(error, 'error_details', None)
+        if not isinstance(details, list) or not details:
+            try:
+                details = orjson.loads(error.content)['error']['errors']
+            except (ValueError, KeyError, TypeError):
+                return False
+        
+        return any(
+            isinstance(detail, dict) and detail.get('reason') in DRIVE_RATE_LIMIT_REASONS
+            for detail in details
+        )
     
-    def get_reddit_json(self, subreddit, sort_by='hot', limit=25):
+    async def get_reddit_json(self, session, subreddit, sort_by='hot', limit=25):
         """
         Fetch Reddit posts using Reddit's JSON API (no authentication needed)
         
         Args:
+            session: Shared aiohttp session
             subreddit: Name of the subreddit
             sort_by: 'hot', 'new', 'top', or 'rising'
             limit: Number of posts to fetch (max 100)
@@ -219,53 +526,48 @@ class RedditMemeScraper:
             time_filter = self.config.get('time_filter', 'day')
             url += f'&t={time_filter}'  # day, week, month, year, all
         
-        # Retry logic
-        max_retries = 3
-        retry_delay = 2
+        # 'new' is newest-first, so before=<newest seen> returns only posts we haven't
+        # fetched yet (after= would page towards older, already-seen ones). hot/top
+        # reorder constantly and get no cursor.
+        last_seen = self.downloaded_ids.state.setdefault('last_seen', {})
+        cursor = last_seen.get(subreddit) if sort_by == 'new' else None
+        if cursor:
+            url += f'&before={cursor}'
         
-        for attempt in range(max_retries):
-            try:
-                # Use different headers for JSON endpoint
-                json_headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                    'Accept': 'application/json'
-                }
-                response = self.session.get(url, headers=json_headers, timeout=20)
-                response.raise_for_status()
-                
-                data = response.json()
-                posts = data['data']['children']
-                
-                return posts
-                
-            except requests.exceptions.Timeout:
-                if attempt < max_retries - 1:
-                    print(f"  ⏳ Timeout, retrying in {retry_delay}s... (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    print(f"  ✗ Failed to fetch r/{subreddit} after {max_retries} attempts (timeout)")
-                    return []
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"  ⏳ Error, retrying in {retry_delay}s... (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
-                else:
-                    print(f"  ✗ Error fetching r/{subreddit}: {str(e)[:80]}")
-                    return []
+        try:
+            await self.bucket.acquire()
+            data = await self._fetch_json(session, url)
+        except asyncio.TimeoutError:
+            print(f"  ✗ Failed to fetch r/{subreddit} after {self.max_retries + 1} attempts (timeout)")
+            return []
+        except Exception as e:
+            print(f"  ✗ Error fetching r/{subreddit}: {str(e)[:80]}")
+            return []
+        
+        posts = data['data']['children']
         
-        return []
+        if sort_by == 'new':
+            if posts:
+                last_seen[subreddit] = posts[0]['data']['name']
+            elif cursor:
+                # Nothing newer, or the anchor post was deleted; full fetch next run
+                del last_seen[subreddit]
+        
+        return posts
+    
+    async def _fetch_json(self, session, url):
+        """GET a JSON listing"""
+        # Use different headers for JSON endpoint; these merge over the session
+        # headers, so Accept-Encoding (and br) still applies to listings
+        async with self._get(session, url, headers=self._JSON_HEADERS) as response:
+            return orjson.loads(await response.read())
     
     def is_image_url(self, url):
         """Check if URL is a direct image link"""
-        image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-        return any(url.lower().endswith(ext) for ext in image_extensions)
+        return _EXT_RE.search(url) is not None
     
     def extract_image_url(self, post_data):
         """Extract image URL from Reddit post data"""
-        import html
         post = post_data['data']
         
         # Check if it's a direct image link
@@ -294,42 +596,83 @@ class RedditMemeScraper:
         
         return None
     
-    def scrape_subreddit(self, subreddit_name, sort_by='hot', limit=25):
+    async def scrape_subreddit_async(self, session, semaphore, subreddit_name, sort_by='hot', limit=25):
         """
         Scrape memes from a subreddit
         
         Args:
+            session: Shared aiohttp session
+            semaphore: Bounds image downloads in flight across all subreddits
             subreddit_name: Name of the subreddit
             sort_by: 'hot', 'new', 'top', or 'rising'
             limit: Number of posts to fetch
         """
         print(f"\n📥 Scraping r/{subreddit_name} ({sort_by})...")
         
-        posts = self.get_reddit_json(subreddit_name, sort_by, limit)
+        posts = await self.get_reddit_json(session, subreddit_name, sort_by, limit)
         
         if not posts:
             print(f"  ⚠️ No posts found for r/{subreddit_name}")
             return []
         
+        async def download(title, post_id, image_url, filename,
+                           upvotes, num_comments, engagement_score, post_age_hours):
+            async with semaphore:
+                # Be respectful with requests
+                await self.bucket.acquire()
+                filepath = await self._fetch_image(session, image_url, filename)
+            
+            if not filepath:
+                return None
+            
+            # Mark as downloaded
+            self.downloaded_ids.add(post_id)
+            age_str = f"{post_age_hours:.1f}h ago" if post_age_hours < 24 else f"{post_age_hours/24:.1f}d ago"
+            print(f"  ✓ {title[:50]}... (↑{upvotes}, 💬{num_comments}, 🕐{age_str})")
+            
+            return {
+                'filepath': filepath,
+                'title': title,
+                'url': image_url,
+                'post_id': post_id,
+                'upvotes': upvotes,
+                'engagement_score': engagement_score,
+                'age_hours': post_age_hours
+            }
+        
         downloaded_files = []
+        downloads = []
         skipped = 0
         already_downloaded = 0
         low_engagement = 0
+        resumed = 0
+        
+        # Files left over from an interrupted run, keyed "<subreddit>_<post_id>" (filenames
+        # end in _<date>_<time><ext>); one directory read instead of a stat per post
+        with os.scandir(self.download_folder) as entries:
+            existing = {entry.name.rsplit('_', 2)[0]: entry.path for entry in entries}
+        
+        # Loop invariants: config thresholds, one clock read, one filename timestamp
+        now = time.time()
+        min_upvotes = self.config.get('min_upvotes', 50)
+        max_age = self.config.get('max_post_age_hours', None)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         for post_data in posts:
             try:
                 post = post_data['data']
                 post_id = post['id']
                 
-                # Skip if already downloaded
-                if post_id in self.downloaded_ids:
+                # Skip if already downloaded, unless its file never made it to Drive
+                leftover = existing.get(f"{subreddit_name}_{post_id}")
+                if post_id in self.downloaded_ids and leftover is None:
                     already_downloaded += 1
                     continue
                 
                 # Get post metrics
                 upvotes = post.get('ups', 0)
                 num_comments = post.get('num_comments', 0)
-                post_age_hours = (time.time() - post.get('created_utc', 0)) / 3600
+                post_age_hours = (now - post.get('created_utc', 0)) / 3600
                 
                 # Calculate engagement score
                 if post_age_hours > 0:
@@ -337,14 +680,28 @@ class RedditMemeScraper:
                 else:
                     engagement_score = 0
                 
+                if leftover is not None:
+                    # Already passed the filters when it was fetched; upload (and delete)
+                    # it with this run's files instead of skipping it forever
+                    self.downloaded_ids.add(post_id)
+                    downloaded_files.append({
+                        'filepath': leftover,
+                        'title': post['title'],
+                        'url': self.extract_image_url(post_data),
+                        'post_id': post_id,
+                        'upvotes': upvotes,
+                        'engagement_score': engagement_score,
+                        'age_hours': post_age_hours
+                    })
+                    resumed += 1
+                    continue
+                
                 # Filter by minimum upvotes
-                min_upvotes = self.config.get('min_upvotes', 50)
                 if upvotes < min_upvotes:
                     low_engagement += 1
                     continue
                 
                 # Optional: Filter by max age (if specified in config)
-                max_age = self.config.get('max_post_age_hours', None)
                 if max_age and post_age_hours > max_age:
                     skipped += 1
                     continue
@@ -356,52 +713,37 @@ class RedditMemeScraper:
                     skipped += 1
                     continue
                 
-                # Create filename
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                
-                # Determine extension from URL
-                if '.jpg' in image_url.lower() or '.jpeg' in image_url.lower():
-                    extension = '.jpg'
-                elif '.png' in image_url.lower():
-                    extension = '.png'
-                elif '.gif' in image_url.lower():
-                    extension = '.gif'
-                elif '.webp' in image_url.lower():
-                    extension = '.webp'
+                # Determine extension from URL (.jpeg is saved as .jpg)
+                match = _EXT_RE.search(image_url)
+                ext = match.group(1).lower() if match else None
+                if ext in ('png', 'gif', 'webp'):
+                    extension = '.' + ext
                 else:
                     extension = '.jpg'  # default
                 
                 # Clean filename
                 filename = f"{subreddit_name}_{post_id}_{timestamp}{extension}"
                 
-                # Download image
-                filepath = self.download_image(image_url, filename)
-                if filepath:
-                    downloaded_files.append({
-                        'filepath': filepath,
-                        'title': post['title'],
-                        'url': image_url,
-                        'post_id': post_id,
-                        'upvotes': upvotes,
-                        'engagement_score': engagement_score,
-                        'age_hours': post_age_hours
-                    })
-                    # Mark as downloaded
-                    self.downloaded_ids.add(post_id)
-                    age_str = f"{post_age_hours:.1f}h ago" if post_age_hours < 24 else f"{post_age_hours/24:.1f}d ago"
-                    print(f"  ✓ {post['title'][:50]}... (↑{upvotes}, 💬{num_comments}, 🕐{age_str})")
-                
-                # Be respectful with requests
-                time.sleep(1.0)
+                # Queue the download; they all run concurrently below
+                downloads.append(download(
+                    post['title'], post_id, image_url, filename,
+                    upvotes, num_comments, engagement_score, post_age_hours
+                ))
                 
             except Exception as e:
                 print(f"  ✗ Error processing post: {e}")
                 skipped += 1
                 continue
         
+        for file_info in await asyncio.gather(*downloads):
+            if file_info:
+                downloaded_files.append(file_info)
+        
         stats_msg = f"  📊 Downloaded: {len(downloaded_files)}, Skipped: {skipped}"
         if already_downloaded > 0:
             stats_msg += f", Already had: {already_downloaded}"
+        if resumed > 0:
+            stats_msg += f", Resumed from disk: {resumed}"
         if low_engagement > 0:
             stats_msg += f", Low engagement: {low_engagement}"
         print(stats_msg)
@@ -411,6 +753,47 @@ class RedditMemeScraper:
         
         return downloaded_files
     
+    async def scrape_all(self, subreddits, sort_by, limit):
+        """Scrape subreddits concurrently over one session"""
+        all_files = []
+        semaphore = asyncio.BoundedSemaphore(self.max_concurrent_downloads)
+        
+        # Caps listings in flight; the token bucket still paces the total request rate
+        subreddit_slots = asyncio.BoundedSemaphore(self.config.get('concurrency', 4))
+        
+        # Created here so its lock belongs to this event loop
+        self.bucket = TokenBucket(self.rate_limit, self.rate_burst)
+        
+        async with self._new_session() as session:
+            async def scrape_one(subreddit):
+                async with subreddit_slots:
+                    files = await self.scrape_subreddit_async(
+                        session, semaphore, subreddit, sort_by, limit
+                    )
+                all_files.extend(files)
+                
+                # Persist after every subreddit so a crash loses at most one
+                await self.save_history_async()
+            
+            try:
+                results = await asyncio.gather(
+                    *(scrape_one(subreddit) for subreddit in subreddits),
+                    return_exceptions=True
+                )
+            except asyncio.CancelledError:
+                # Ctrl+C cancels the scrape: record what we have and let the cancel through.
+                # Synchronous on purpose, so a second cancel can't interrupt the save;
+                # the files already on disk are picked up and uploaded by the next run
+                print("\n⚠️ Interrupted by user. Saving history...")
+                self.save_history()
+                raise
+        
+        for subreddit, result in zip(subreddits, results):
+            if isinstance(result, Exception):
+                print(f"\n⚠️ Error scraping r/{subreddit}: {result}")
+        
+        return all_files
+    
     def run(self):
         """Main execution function"""
         print("🚀 Starting Reddit Meme Scraper (No API)")
@@ -426,23 +809,7 @@ class RedditMemeScraper:
         sort_by = self.config.get('sort_by', 'hot')
         limit = self.config.get('limit', 25)
         
-        all_files = []
-        
-        # Scrape each subreddit
-        for subreddit in subreddits:
-            try:
-                files = self.scrape_subreddit(subreddit, sort_by, limit)
-                all_files.extend(files)
-                
-                # Wait between subreddits to be respectful
-                time.sleep(2)
-            except KeyboardInterrupt:
-                print("\n⚠️ Interrupted by user. Uploading downloaded memes...")
-                break
-            except Exception as e:
-                print(f"\n⚠️ Error scraping r/{subreddit}: {e}")
-                print("Continuing with next subreddit...")
-                continue
+        all_files = asyncio.run(self.scrape_all(subreddits, sort_by, limit))
         
         if not all_files:
             print("\n⚠️ No memes downloaded. Exiting.")
@@ -454,16 +821,25 @@ class RedditMemeScraper:
         uploaded_count = 0
         failed_uploads = 0
         
-        for file_info in all_files:
-            try:
-                link = self.upload_to_drive(file_info['filepath'], folder_id)
-                if link:
-                    uploaded_count += 1
-                else:
+        # Uploads are network-bound, so threads overlap them; the worker count
+        # keeps us under Drive's per-user request rate
+        with ThreadPoolExecutor(max_workers=self.config.get('upload_workers', 8)) as executor:
+            futures = {
+                executor.submit(self.upload_to_drive, file_info['filepath'], folder_id): file_info
+                for file_info in all_files
+            }
+            
+            for future in as_completed(futures):
+                file_info = futures[future]
+                try:
+                    link = future.result()
+                    if link:
+                        uploaded_count += 1
+                    else:
+                        failed_uploads += 1
+                except Exception as e:
+                    print(f"  ✗ Upload failed: {os.path.basename(file_info['filepath'])}")
                     failed_uploads += 1
-            except Exception as e:
-                print(f"  ✗ Upload failed: {os.path.basename(file_info['filepath'])}")
-                failed_uploads += 1
         
         # Cleanup - delete local files
         if self.config.get('delete_after_upload', True):
@@ -1,4 +1,5 @@
 import requests
+import io
 import os
 import json
 import time
@@ -57,6 +58,16 @@ class RedditMemeScraper:
     def is_image_url(self, url):
         return any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp'])
     
+    def is_image_bytes(self, data):
+        """Check magic bytes for JPEG, PNG, GIF or WebP"""
+        header = bytes(data[:12])
+        return (
+            header[:3] == b'\xff\xd8\xff'
+            or header[:8] == b'\x89PNG\r\n\x1a\n'
+            or header[:6] in (b'GIF87a', b'GIF89a')
+            or (header[:4] == b'RIFF' and header[8:12] == b'WEBP')
+        )
+    
     def extract_image_url(self, post_data):
         post = post_data.get('data', {})
         url = post.get('url', '')
@@ -82,18 +93,22 @@ class RedditMemeScraper:
     
     def download_image(self, url, filename):
         try:
-            response = self.session.get(url, timeout=20)
-            response.raise_for_status()
+            # Validate in memory so rejects never touch the disk
+            buf = io.BytesIO()
+            with self.session.get(url, timeout=20, stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=65536):
+                    buf.write(chunk)
+            
+            data = buf.getbuffer()
+            if len(data) <= 10000 or not self.is_image_bytes(data):
+                return None
             
             filepath = os.path.join(self.download_folder, filename)
             with open(filepath, 'wb') as f:
-                f.write(response.content)
+                f.write(data)
             
-            if os.path.getsize(filepath) > 10000:
-                return filepath
-            else:
-                os.remove(filepath)
-                return None
+            return filepath
         except Exception as e:
             print(f"Download error: {e}")
             return None
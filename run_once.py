@@ -1,53 +1,302 @@
 import asyncio
+import atexit
+import concurrent.futures
+import glob
 import logging
 import os
-import shutil
-from pathlib import Path
+import signal
+import sys
+import threading
+import time
+from config_loader import load_json_config
 from master_pipeline import MasterPipeline
 
+# libuv-backed event loop when available (not on Windows)
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+# None of our formats use thread/process fields, so don't collect them per record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CONFIG_PATH = "config_final.json"
+
+FOLDERS_TO_CLEAN = ['memes', 'tiktok_downloads']
+
+# Seconds exit will wait for background deletes to finish
+BACKGROUND_DELETE_GRACE = 10
+
+# Batched IORING_OP_UNLINKAT for cleanup on Linux, if the bindings are installed
+try:
+    import liburing
+    LIBURING_AVAILABLE = hasattr(os, 'getuid')
+except ImportError:
+    LIBURING_AVAILABLE = False
+
+URING_BATCH = 256
+
+
+def _clear_folder(folder):
+    """Delete everything inside folder, unlinking files in parallel"""
+    names = []
+    subdirs = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            else:
+                names.append(entry.name)
+    
+    if LIBURING_AVAILABLE and names:
+        try:
+            names = _uring_unlink(folder, names)
+        except Exception as e:
+            logger.warning("io_uring unlink unavailable, using threads: %s", e)
+    
+    # Unlinks are syscall-latency bound, so overlapping them pays off (most on network disks).
+    # Plain daemon threads, not an executor: this runs on background delete threads, and
+    # concurrent.futures refuses new work (and joins its workers unbounded) once exit begins
+    files = [os.path.join(folder, name) for name in names]
+    workers = min(32, (os.cpu_count() or 1) * 4, len(files))
+    threads = [
+        threading.Thread(target=_unlink_each, args=(files[i::workers],), daemon=True)
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    for subdir in subdirs:
+        _fast_rmtree(subdir)
+
+def _unlink_each(paths):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def _uring_unlink(folder, names):
+    """
+    Unlink names relative to folder, URING_BATCH submissions per io_uring_enter
+    
+    Returns the names of any batch with a failed completion, for the threaded
+    path to retry (it tolerates the ones that did go).
+    """
+    ring = liburing.io_uring()
+    cqe = liburing.io_uring_cqe()
+    dfd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    retry = []
+    try:
+        liburing.io_uring_queue_init(URING_BATCH, ring, 0)
+        try:
+            for start in range(0, len(names), URING_BATCH):
+                batch = names[start:start + URING_BATCH]
+                # Encoded paths must stay referenced until their completions are reaped
+                paths = [os.fsencode(name) for name in batch]
+                for path in paths:
+                    sqe = liburing.io_uring_get_sqe(ring)
+                    liburing.io_uring_prep_unlinkat(sqe, path, 0, dfd)
+                liburing.io_uring_submit(ring)
+                
+                failed = False
+                for _ in paths:
+                    liburing.io_uring_wait_cqe(ring, cqe)
+                    failed = failed or cqe.res < 0
+                    liburing.io_uring_cqe_seen(ring, cqe)
+                if failed:
+                    retry.extend(batch)
+        finally:
+            liburing.io_uring_queue_exit(ring)
+    finally:
+        os.close(dfd)
+    
+    return retry
+
+def _fast_rmtree(path):
+    """
+    Iterative rmtree driven by os.scandir
+    
+    DirEntry.is_dir(follow_symlinks=False) answers from the cached d_type on Linux,
+    so there's no lstat per entry; directories go in reverse BFS order once emptied.
+    """
+    dirs = [path]
+    index = 0
+    while index < len(dirs):
+        with os.scandir(dirs[index]) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                else:
+                    os.unlink(entry.path)
+        index += 1
+    
+    for directory in reversed(dirs):
+        os.rmdir(directory)
+
+def _remove_tree(path):
+    """Delete a folder and everything in it"""
+    try:
+        _clear_folder(path)
+        os.rmdir(path)
+    except Exception as e:
+        logger.error("Background delete error for %s: %s", path, e)
+
+_background_deletes = []
+
+def _delete_in_background(path):
+    # Daemon, so exit waits at most BACKGROUND_DELETE_GRACE; whatever is left is swept on the next start
+    thread = threading.Thread(target=_remove_tree, args=(path,), daemon=True)
+    thread.start()
+    _background_deletes.append(thread)
+
+@atexit.register
+def _finish_background_deletes():
+    deadline = time.monotonic() + BACKGROUND_DELETE_GRACE
+    for thread in _background_deletes:
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+def sweep_stale_trash():
+    """Delete trash folders a previous run exited before finishing"""
+    for folder in FOLDERS_TO_CLEAN:
+        for path in glob.glob(f"{glob.escape(folder)}.trash.*"):
+            _delete_in_background(path)
+
+def _ensure_dir(path):
+    # Usually already there: one stat instead of a mkdir that fails with EEXIST
+    if not os.path.isdir(path):
+        os.makedirs(path, exist_ok=True)
+
 def cleanup_files():
     """Delete downloaded files after pipeline completes"""
-    folders_to_clean = ['memes', 'tiktok_downloads']
-    
-    for folder in folders_to_clean:
-        if os.path.exists(folder):
-            try:
-                shutil.rmtree(folder)
-                os.makedirs(folder, exist_ok=True)
-                logger.info(f"🧹 Cleaned up {folder}/")
-            except Exception as e:
-                logger.error(f"Cleanup error for {folder}: {e}")
+    for folder in FOLDERS_TO_CLEAN:
+        # One getdents answers both "does it exist" and "is there anything to do";
+        # an early-failed cycle leaves the folders empty, so nothing else runs
+        try:
+            with os.scandir(folder) as entries:
+                if next(entries, None) is None:
+                    continue
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        
+        try:
+            # Rename is one metadata op; the empty folder is back immediately and the
+            # old tree is deleted off the shutdown path
+            trash = f"{folder}.trash.{os.getpid()}.{time.time_ns()}"
+            os.rename(folder, trash)
+            os.makedirs(folder, exist_ok=True)
+            _delete_in_background(trash)
+            logger.info("🧹 Cleaned up %s/", folder)
+        except Exception as e:
+            logger.error("Cleanup error for %s: %s", folder, e)
 
 async def run_once():
-    Path("logs").mkdir(exist_ok=True)
-    Path("memes").mkdir(exist_ok=True)
+    # One warm, sized pool behind every to_thread/run_in_executor(None, ...) call
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="pipeline")
+    asyncio.get_running_loop().set_default_executor(executor)
+    
+    _ensure_dir("logs")
+    _ensure_dir("memes")
+    sweep_stale_trash()
     
-    pipeline = MasterPipeline()
-    bot_token = pipeline.config.get("discord", {}).get("bot_token")
+    # Discord tokens are ~70 chars; catch missing/placeholder ones before CLIP is loaded or
+    # any gateway connection is set up. The parse is cached, so MasterPipeline reuses it
+    config = await asyncio.to_thread(load_json_config, CONFIG_PATH)
+    bot_token = config.get("discord", {}).get("bot_token")
+    if not isinstance(bot_token, str) or len(bot_token) < 50:
+        logger.error("Invalid bot token")
+        executor.shutdown(wait=False)
+        return
     
-    async def run_bot():
-        await pipeline.discord.bot.start(bot_token)
+    # Config parsing, CLIP loading etc. are blocking, so construct on a worker thread
+    pipeline = await asyncio.to_thread(MasterPipeline, CONFIG_PATH)
     
-    bot_task = asyncio.create_task(run_bot())
+    cleanup_task = None
     
-    for i in range(30):
-        await asyncio.sleep(1)
-        if pipeline.discord.bot.is_ready():
-            logger.info("✅ Bot connected!")
-            break
-    else:
-        logger.error("Bot failed to connect")
-        return
+    def start_cleanup():
+        """Start cleanup once; later callers get the same task"""
+        nonlocal cleanup_task
+        if cleanup_task is None:
+            # scandir/rename/makedirs block, so they run on the default executor
+            cleanup_task = asyncio.ensure_future(asyncio.to_thread(cleanup_files))
+        return cleanup_task
+    
+    async def run_pipeline():
+        try:
+            # Resumes the moment READY fires instead of polling once a second
+            try:
+                await asyncio.wait_for(pipeline.discord.bot.wait_until_ready(), timeout=30)
+                logger.info("✅ Bot connected!")
+            except asyncio.TimeoutError:
+                logger.error("Bot failed to connect")
+                return
+            
+            await pipeline.run_cycle()
+        finally:
+            # Closing the bot lets bot.start() return, which ends the task group;
+            # the gateway teardown and the disk cleanup are independent, so overlap them
+            await asyncio.gather(
+                pipeline.discord.bot.close(), start_cleanup(), return_exceptions=True
+            )
     
+    # Ctrl-C / SIGTERM cancel this task instead of raising KeyboardInterrupt wherever
+    # the loop happens to be, so the finally below always runs (not available on Windows)
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    signals = []
+    received = []
+    
+    def on_signal(sig):
+        received.append(sig)
+        # One graceful shutdown only: a second Ctrl-C gets the default handler and forces exit
+        for installed in signals:
+            loop.remove_signal_handler(installed)
+        main_task.cancel()
+    
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, on_signal, sig)
+            signals.append(sig)
+        except (NotImplementedError, RuntimeError):
+            pass
+    
+    # Bot and pipeline share one scope: if either fails, the other is cancelled;
+    # the bot's own context guarantees close() (HTTP connector, SSL) however we leave
     try:
-        await pipeline.run_cycle()
+        async with pipeline.discord.bot:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(pipeline.discord.bot.start(bot_token))
+                tg.create_task(run_pipeline())
+    except asyncio.CancelledError:
+        # Cancelled from outside rather than by our handler: not ours to absorb
+        if not received:
+            raise
+        logger.warning("Interrupted by %s, shutting down", signal.Signals(received[0]).name)
     finally:
-        await pipeline.discord.bot.close()
-        cleanup_files()
+        for sig in signals:
+            loop.remove_signal_handler(sig)
+        
+        # Already done unless the pipeline task was cancelled before it ever ran
+        await start_cleanup()
+        
+        # Background deletes run on their own threads, so nothing here is worth waiting on
+        executor.shutdown(wait=False, cancel_futures=True)
         logger.info("✅ Done!")
+    
+    # Cleanup has run; still report the signal to whatever launched us (130 / 143)
+    if received:
+        sys.exit(128 + received[0])
 
 if __name__ == "__main__":
-    asyncio.run(run_once())
\ No newline at end of file
+    if UVLOOP_AVAILABLE:
+        uvloop.run(run_once())
+    else:
+        asyncio.run(run_once())
\ No newline at end of file